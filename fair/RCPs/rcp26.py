@@ -7,6 +7,8 @@
 
 import numpy as np
 import os
+from .._lazy import lazy, column, module_getattr
+from .._cache import loadtxt
 emissions_filename = os.path.join(
     os.path.dirname(__file__), 'data/RCP3PD_EMISSIONS.csv')
 concentrations_filename = os.path.join(
@@ -18,117 +20,121 @@ aviNOx_filename = os.path.join(
 fossilCH4_filename = os.path.join(
     os.path.dirname(__file__), 'data/fossilCH4_fraction.csv')
 
-aviNOx_frac = np.loadtxt(aviNOx_filename, skiprows=5, usecols=(1,),
-    delimiter=',')
-fossilCH4_frac = np.loadtxt(fossilCH4_filename, skiprows=5, usecols=(1,),
-    delimiter=',')
+__getattr__ = module_getattr(globals(), {
+    'aviNOx_frac': lambda: loadtxt(aviNOx_filename, skiprows=5,
+      usecols=(1,), delimiter=','),
+    'fossilCH4_frac': lambda: loadtxt(fossilCH4_filename, skiprows=5,
+      usecols=(1,), delimiter=','),
+})
 
 class Emissions:
-    emissions = np.loadtxt(emissions_filename, skiprows=37, delimiter=',')
-    year      = emissions[:,0]
-    co2_fossil= emissions[:,1]
-    co2_land  = emissions[:,2]
-    co2       = np.sum(emissions[:,1:3],axis=1)
-    ch4       = emissions[:,3]
-    n2o       = emissions[:,4]
-    sox       = emissions[:,5]
-    co        = emissions[:,6]
-    nmvoc     = emissions[:,7]
-    nox       = emissions[:,8]
-    bc        = emissions[:,9]
-    oc        = emissions[:,10]
-    nh3       = emissions[:,11]
-    cf4       = emissions[:,12]
-    c2f6      = emissions[:,13]
-    c6f14     = emissions[:,14]
-    hfc23     = emissions[:,15]
-    hfc32     = emissions[:,16]
-    hfc43_10  = emissions[:,17]
-    hfc125    = emissions[:,18]
-    hfc134a   = emissions[:,19]
-    hfc143a   = emissions[:,20]
-    hfc227ea  = emissions[:,21]
-    hfc245fa  = emissions[:,22]
-    sf6       = emissions[:,23]
-    cfc11     = emissions[:,24]
-    cfc12     = emissions[:,25]
-    cfc113    = emissions[:,26]
-    cfc114    = emissions[:,27]
-    cfc115    = emissions[:,28]
-    carb_tet  = emissions[:,29]
-    mcf       = emissions[:,30]
-    hcfc22    = emissions[:,31]
-    hcfc141b  = emissions[:,32]
-    hcfc142b  = emissions[:,33]
-    halon1211 = emissions[:,34]
-    halon1202 = emissions[:,35]
-    halon1301 = emissions[:,36]
-    halon2402 = emissions[:,37]
-    ch3br     = emissions[:,38]
-    ch3cl     = emissions[:,39]
+    emissions = lazy(lambda cls: loadtxt(emissions_filename,
+      skiprows=37, delimiter=','))
+    year      = column('emissions', 0)
+    co2_fossil= column('emissions', 1)
+    co2_land  = column('emissions', 2)
+    co2       = lazy(lambda cls: np.sum(cls.emissions[:,1:3],axis=1))
+    ch4       = column('emissions', 3)
+    n2o       = column('emissions', 4)
+    sox       = column('emissions', 5)
+    co        = column('emissions', 6)
+    nmvoc     = column('emissions', 7)
+    nox       = column('emissions', 8)
+    bc        = column('emissions', 9)
+    oc        = column('emissions', 10)
+    nh3       = column('emissions', 11)
+    cf4       = column('emissions', 12)
+    c2f6      = column('emissions', 13)
+    c6f14     = column('emissions', 14)
+    hfc23     = column('emissions', 15)
+    hfc32     = column('emissions', 16)
+    hfc43_10  = column('emissions', 17)
+    hfc125    = column('emissions', 18)
+    hfc134a   = column('emissions', 19)
+    hfc143a   = column('emissions', 20)
+    hfc227ea  = column('emissions', 21)
+    hfc245fa  = column('emissions', 22)
+    sf6       = column('emissions', 23)
+    cfc11     = column('emissions', 24)
+    cfc12     = column('emissions', 25)
+    cfc113    = column('emissions', 26)
+    cfc114    = column('emissions', 27)
+    cfc115    = column('emissions', 28)
+    carb_tet  = column('emissions', 29)
+    mcf       = column('emissions', 30)
+    hcfc22    = column('emissions', 31)
+    hcfc141b  = column('emissions', 32)
+    hcfc142b  = column('emissions', 33)
+    halon1211 = column('emissions', 34)
+    halon1202 = column('emissions', 35)
+    halon1301 = column('emissions', 36)
+    halon2402 = column('emissions', 37)
+    ch3br     = column('emissions', 38)
+    ch3cl     = column('emissions', 39)
 
 
 class Concentrations:
-    concentrations = np.loadtxt(concentrations_filename, skiprows=39,
-      delimiter=',')
+    concentrations = lazy(lambda cls: loadtxt(concentrations_filename,
+      skiprows=39, delimiter=','))
     gas_indices= np.concatenate(([3,4,5], np.arange(8,36)))
-    gases      = concentrations[:,gas_indices]
-    year       = concentrations[:,0]
-    co2eq      = concentrations[:,1]
-    kyotoco2eq = concentrations[:,2]
-    co2        = concentrations[:,3]
-    ch4        = concentrations[:,4]
-    n2o        = concentrations[:,5]
-    fgassum    = concentrations[:,6]
-    mhalosum   = concentrations[:,7]
-    cf4        = concentrations[:,8]
-    c2f6       = concentrations[:,9]
-    c6f14      = concentrations[:,10]
-    hfc23      = concentrations[:,11]
-    hfc32      = concentrations[:,12]
-    hfc43_10   = concentrations[:,13]
-    hfc125     = concentrations[:,14]
-    hfc134a    = concentrations[:,15]
-    hfc143a    = concentrations[:,16]
-    hfc227ea   = concentrations[:,17]
-    hfc245fa   = concentrations[:,18]
-    sf6        = concentrations[:,19]
-    cfc11      = concentrations[:,20]
-    cfc12      = concentrations[:,21]
-    cfc113     = concentrations[:,22]
-    cfc114     = concentrations[:,23]
-    cfc115     = concentrations[:,24]
-    carb_tet   = concentrations[:,25]
-    mcf        = concentrations[:,26]
-    hcfc22     = concentrations[:,27]
-    hcfc141b   = concentrations[:,28]
-    hcfc142b   = concentrations[:,29]
-    halon1211  = concentrations[:,30]
-    halon1202  = concentrations[:,31]
-    halon1301  = concentrations[:,32]
-    halon2402  = concentrations[:,33]
-    ch3br      = concentrations[:,34]
-    ch3cl      = concentrations[:,35]    
+    gases      = lazy(lambda cls: cls.concentrations[:,cls.gas_indices])
+    year       = column('concentrations', 0)
+    co2eq      = column('concentrations', 1)
+    kyotoco2eq = column('concentrations', 2)
+    co2        = column('concentrations', 3)
+    ch4        = column('concentrations', 4)
+    n2o        = column('concentrations', 5)
+    fgassum    = column('concentrations', 6)
+    mhalosum   = column('concentrations', 7)
+    cf4        = column('concentrations', 8)
+    c2f6       = column('concentrations', 9)
+    c6f14      = column('concentrations', 10)
+    hfc23      = column('concentrations', 11)
+    hfc32      = column('concentrations', 12)
+    hfc43_10   = column('concentrations', 13)
+    hfc125     = column('concentrations', 14)
+    hfc134a    = column('concentrations', 15)
+    hfc143a    = column('concentrations', 16)
+    hfc227ea   = column('concentrations', 17)
+    hfc245fa   = column('concentrations', 18)
+    sf6        = column('concentrations', 19)
+    cfc11      = column('concentrations', 20)
+    cfc12      = column('concentrations', 21)
+    cfc113     = column('concentrations', 22)
+    cfc114     = column('concentrations', 23)
+    cfc115     = column('concentrations', 24)
+    carb_tet   = column('concentrations', 25)
+    mcf        = column('concentrations', 26)
+    hcfc22     = column('concentrations', 27)
+    hcfc141b   = column('concentrations', 28)
+    hcfc142b   = column('concentrations', 29)
+    halon1211  = column('concentrations', 30)
+    halon1202  = column('concentrations', 31)
+    halon1301  = column('concentrations', 32)
+    halon2402  = column('concentrations', 33)
+    ch3br      = column('concentrations', 34)
+    ch3cl      = column('concentrations', 35)
     
     
 class Forcing:
-    forcing   = np.loadtxt(forcing_filename, skiprows=59, delimiter=',')
-    year      = forcing[:,0]
-    total     = forcing[:,1]
-    volcanic  = forcing[:,2]
-    solar     = forcing[:,3]
-    ghg       = forcing[:,5]
-    co2       = forcing[:,8]
-    ch4       = forcing[:,9]
-    n2o       = forcing[:,10]
-    fgas      = forcing[:,11]
-    halo      = forcing[:,12]
-    aero      = forcing[:,41]
-    cloud     = forcing[:,48]
-    strato3   = forcing[:,49]
-    tropo3    = forcing[:,50]
-    stwv      = forcing[:,51]
-    dust      = forcing[:,47]
-    landuse   = forcing[:,52]
-    bcsnow    = forcing[:,53]
+    forcing   = lazy(lambda cls: loadtxt(forcing_filename,
+      skiprows=59, delimiter=','))
+    year      = column('forcing', 0)
+    total     = column('forcing', 1)
+    volcanic  = column('forcing', 2)
+    solar     = column('forcing', 3)
+    ghg       = column('forcing', 5)
+    co2       = column('forcing', 8)
+    ch4       = column('forcing', 9)
+    n2o       = column('forcing', 10)
+    fgas      = column('forcing', 11)
+    halo      = column('forcing', 12)
+    aero      = column('forcing', 41)
+    cloud     = column('forcing', 48)
+    strato3   = column('forcing', 49)
+    tropo3    = column('forcing', 50)
+    stwv      = column('forcing', 51)
+    dust      = column('forcing', 47)
+    landuse   = column('forcing', 52)
+    bcsnow    = column('forcing', 53)
 
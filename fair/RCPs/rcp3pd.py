@@ -1,5 +1,9 @@
 import warnings
 from .rcp26 import *
+from . import rcp26 as _rcp26
+
+# lazily loaded module attributes
+__getattr__ = _rcp26.__getattr__
 
 warnings.warn('name rcp3pd will be deprecated in FaIR 2.0. Please use rcp26.',
   DeprecationWarning)
@@ -1,5 +1,9 @@
 import warnings
 from .rcp60 import *
+from . import rcp60 as _rcp60
+
+# lazily loaded module attributes
+__getattr__ = _rcp60.__getattr__
 
 warnings.warn('name rcp6 will be deprecated in FaIR 2.0. Please use rcp60.',
   DeprecationWarning)
@@ -0,0 +1,159 @@
+# Binary cache of the bundled datasets.
+#
+# Parsing the bundled CSV files is slow compared with everything else needed
+# to start a run. On first use each file is parsed once and saved as .npy in
+# a user cache directory, keyed on the contents of the source file and the
+# parsing options. Later loads memory-map the .npy file copy-on-write, so they
+# are nearly free and processes on one machine share the same pages until
+# one of them modifies its array. Changes are never written back to the
+# cache.
+#
+# The cache directory is $FAIR_CACHE_DIR if set, else fair under
+# $XDG_CACHE_HOME (~/.cache by default). Set FAIR_CACHE_DIR to an empty string
+# to disable the cache. Cache files are readable by everyone who can read the
+# directory, so it can be shared between users. If the cache directory cannot
+# be written, or an entry cannot be read, the data are parsed as before.
+#
+# Each cache file is named after the source file, a hash of the parsing
+# options and a hash of the source contents. Saving an entry removes older
+# entries of the same source and options, so the cache does not grow as
+# sources change. Increase _format when the stored products change in a way
+# the key does not capture.
+
+import glob
+import hashlib
+import os
+import re
+import tempfile
+
+import numpy as np
+
+_format = 1
+
+
+def cache_dir():
+    """Directory holding cached datasets, or None if caching is disabled."""
+    path = os.environ.get('FAIR_CACHE_DIR')
+    if path is None:
+        path = os.path.join(os.environ.get('XDG_CACHE_HOME',
+          os.path.join(os.path.expanduser('~'), '.cache')), 'fair')
+    return path or None
+
+
+def file_hash(filename):
+    """SHA-1 hex digest of the contents of a file."""
+    h = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _prefix(filename, tag):
+    """Start of the names of cache entries of a source file and tag."""
+    key = hashlib.sha1((str(_format) + tag).encode()).hexdigest()[:8]
+    return os.path.basename(filename) + '.' + key + '.'
+
+
+def cache_path(filename, tag=''):
+    """Path of the cache entry for a source file, or None if disabled.
+
+    Inputs:
+        filename: source data file
+
+    Keywords:
+        tag: string distinguishing different products of the same file,
+            e.g. the parsing options
+    """
+    directory = cache_dir()
+    if directory is None:
+        return None
+    return os.path.join(directory, _prefix(filename, tag) +
+      file_hash(filename)[:16] + '.npy')
+
+
+def _umask():
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+def _save(path, array):
+    """Writes array to path atomically; returns False if it cannot."""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, array)
+            # mkstemp creates files readable by their owner only
+            os.chmod(tmp, 0o666 & ~_umask())
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+    except OSError:
+        return False
+    return True
+
+
+def _prune(path, filename, tag):
+    """Removes other entries of the same source file and tag."""
+    prefix = os.path.join(os.path.dirname(path), _prefix(filename, tag))
+    # entries named before the options hash was added to the name
+    legacy = re.compile(re.escape(os.path.basename(filename)) +
+      r'\.[0-9a-f]{16}\.npy$')
+    old = set(glob.glob(glob.escape(prefix) + '*.npy'))
+    old.update(f for f in glob.glob(os.path.join(glob.escape(
+      os.path.dirname(path)), '*.npy')) if legacy.match(os.path.basename(f)))
+    old.discard(path)
+    for f in old:
+        try:
+            os.remove(f)
+        except OSError:
+            pass
+
+
+def _load(path):
+    """Copy-on-write memory map of a cache entry, or None if unreadable."""
+    try:
+        return np.asarray(np.load(path, mmap_mode='c'))
+    except (OSError, ValueError):
+        return None
+
+
+def cached(filename, build, tag=''):
+    """Array built from a source file, cached on disk.
+
+    Inputs:
+        filename: source data file
+        build: function of no arguments returning the array
+
+    Keywords:
+        tag: string distinguishing different products of the same file
+
+    Returns:
+        array, memory-mapped copy-on-write from the cache where possible.
+        The array can be modified without changing the cache.
+    """
+    path = cache_path(filename, tag=tag)
+    if path is not None and os.path.exists(path):
+        array = _load(path)
+        if array is not None:
+            return array
+    array = np.ascontiguousarray(build())
+    if path is not None and _save(path, array):
+        _prune(path, filename, tag)
+        loaded = _load(path)
+        if loaded is not None:
+            return loaded
+    return array
+
+
+def loadtxt(filename, **kwargs):
+    """np.loadtxt through the dataset cache.
+
+    Takes the same arguments as np.loadtxt and returns the same array.
+    """
+    return cached(filename, lambda: np.loadtxt(filename, **kwargs),
+      tag=repr(sorted(kwargs.items())))
@@ -0,0 +1,49 @@
+# Lazy loading of the bundled datasets.
+#
+# Datasets are read on first attribute access and then cached, so importing
+# fair does not parse any data files. Class attributes (e.g.
+# rcp45.Emissions.co2) use the lazy descriptor; module attributes (e.g.
+# rcp45.aviNOx_frac) use a module __getattr__ from module_getattr.
+
+
+class lazy(object):
+    """Class attribute calculated from the class on first access.
+
+    The value replaces the descriptor on the class, so later accesses are
+    ordinary attribute lookups.
+    """
+
+    def __init__(self, func):
+        self.func = func
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        value = self.func(owner)
+        setattr(owner, self.name, value)
+        return value
+
+
+def column(source, index):
+    """Lazy class attribute holding one column of another attribute."""
+    return lazy(lambda cls: getattr(cls, source)[:,index])
+
+
+def module_getattr(namespace, loaders):
+    """Module __getattr__ that loads module attributes on first access.
+
+    Inputs:
+        namespace: globals() of the module
+        loaders: dict of attribute name to function returning its value
+    """
+    def __getattr__(name):
+        if name in namespace:
+            return namespace[name]
+        if name not in loaders:
+            raise AttributeError('module ' + namespace['__name__'] +
+              ' has no attribute ' + name)
+        value = loaders[name]()
+        namespace[name] = value
+        return value
+    return __getattr__
@@ -1,21 +1,24 @@
 import numpy as np
 import os
+from .._lazy import lazy, column
+from .._cache import loadtxt
 
 forcing_filename = os.path.join(os.path.dirname(__file__),
     'cmip5_annex2_forcing.csv')
 
 class Forcing:
-    forcing  = np.loadtxt(forcing_filename, skiprows=1, delimiter=',')
-    year     = forcing[:,0]
-    co2      = forcing[:,1]
-    ghg_other= forcing[:,2]
-    tropo3   = forcing[:,3]
-    strato3  = forcing[:,4]
-    aero     = forcing[:,5]
-    landuse  = forcing[:,6]
-    stwv     = forcing[:,7]
-    bcsnow   = forcing[:,8]
-    contrails= forcing[:,9]
-    solar    = forcing[:,10]
-    volcanic = forcing[:,11]
-    total    = np.sum(forcing[:,1:], axis=1)
+    forcing  = lazy(lambda cls: loadtxt(forcing_filename,
+      skiprows=1, delimiter=','))
+    year     = column('forcing', 0)
+    co2      = column('forcing', 1)
+    ghg_other= column('forcing', 2)
+    tropo3   = column('forcing', 3)
+    strato3  = column('forcing', 4)
+    aero     = column('forcing', 5)
+    landuse  = column('forcing', 6)
+    stwv     = column('forcing', 7)
+    bcsnow   = column('forcing', 8)
+    contrails= column('forcing', 9)
+    solar    = column('forcing', 10)
+    volcanic = column('forcing', 11)
+    total    = lazy(lambda cls: np.sum(cls.forcing[:,1:], axis=1))
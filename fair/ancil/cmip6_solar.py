@@ -1,9 +1,12 @@
 import numpy as np
 import os
+from .._lazy import lazy, column
+from .._cache import loadtxt
 
 forcing_filename = os.path.join(os.path.dirname(__file__), 'cmip6_solar.csv')
 
 class Forcing:
-    forcing  = np.loadtxt(forcing_filename, skiprows=7, delimiter=',')
-    year     = forcing[:,0]
-    solar    = forcing[:,1]
+    forcing  = lazy(lambda cls: loadtxt(forcing_filename,
+      skiprows=7, delimiter=','))
+    year     = column('forcing', 0)
+    solar    = column('forcing', 1)
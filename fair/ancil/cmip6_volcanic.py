@@ -1,9 +1,12 @@
 import numpy as np
 import os
+from .._lazy import lazy, column
+from .._cache import loadtxt
 
 forcing_filename = os.path.join(os.path.dirname(__file__), 'cmip6_volcanic.csv')
 
 class Forcing:
-    forcing  = np.loadtxt(forcing_filename, skiprows=9, delimiter=',')
-    year     = forcing[:,0]
-    volcanic = forcing[:,1]
+    forcing  = lazy(lambda cls: loadtxt(forcing_filename,
+      skiprows=9, delimiter=','))
+    year     = column('forcing', 0)
+    volcanic = column('forcing', 1)
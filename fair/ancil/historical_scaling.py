@@ -4,7 +4,11 @@
 
 import numpy as np
 import os
+from .._lazy import module_getattr
+from .._cache import loadtxt
 
 filename = os.path.join(os.path.dirname(__file__), 'historical_scaling.csv')
-all = np.loadtxt(filename, skiprows=0, delimiter=',')
-co2 = all[:,0]
+__getattr__ = module_getattr(globals(), {
+    'all': lambda: loadtxt(filename, skiprows=0, delimiter=','),
+    'co2': lambda: __getattr__('all')[:,0],
+})
@@ -1,11 +1,13 @@
 import numpy as np
 import os
+from .._lazy import lazy, column
+from .._cache import loadtxt
 
 emissions_filename = os.path.join(os.path.dirname(__file__), 'natural.csv')
 
 class Emissions:
-    alldata   = np.loadtxt(emissions_filename, skiprows=4)
-    year      = alldata[:,0]
-    ch4       = alldata[:,1]
-    n2o       = alldata[:,2]
-    emissions = alldata[:,1:]
+    alldata   = lazy(lambda cls: loadtxt(emissions_filename, skiprows=4))
+    year      = column('alldata', 0)
+    ch4       = column('alldata', 1)
+    n2o       = column('alldata', 2)
+    emissions = lazy(lambda cls: cls.alldata[:,1:])
@@ -0,0 +1,84 @@
+# Registry of greenhouse gas species and their properties, collected from the
+# individual constants modules.
+#
+# registry is a read-only structured array with one row per species. The
+# first 31 rows are the gases of the RCPs/AR5/CMIP5 in the order of the
+# fair_scm concentrations array, so registry[:31] matches the aslist lists of
+# the constants modules. Further gases follow in the order of the lifetime
+# module. Non-ODS species have no chlorine, bromine or fractional release.
+#
+# Use lookup() or index for name -> row lookups; names are case-insensitive
+# and the aliases used in the constants modules are recognised.
+
+import numpy as np
+from types import MappingProxyType
+from . import molwt, lifetime, radeff, preindconc, cl_atoms, br_atoms, fracrel
+
+# alternative names used in the constants modules
+aliases = MappingProxyType(
+    {'HFC43_10MEE': 'HFC43_10', 'CCL4': 'CARB_TET', 'CH3CCL3': 'MCF'})
+
+model = ('CO2', 'CH4', 'N2O', 'CF4', 'C2F6', 'C6F14', 'HFC23', 'HFC32',
+         'HFC43_10', 'HFC125', 'HFC134A', 'HFC143A', 'HFC227EA', 'HFC245FA',
+         'SF6', 'CFC11', 'CFC12', 'CFC113', 'CFC114', 'CFC115', 'CARB_TET',
+         'MCF', 'HCFC22', 'HCFC141B', 'HCFC142B', 'HALON1211', 'HALON1202',
+         'HALON1301', 'HALON2402', 'CH3BR', 'CH3CL')
+nmodel = len(model)
+
+# ozone depleting substances in the model, as used in EESC
+ods = slice(15, nmodel)
+
+names = model + tuple(name for name, value in vars(lifetime).items()
+    if name.isupper() and isinstance(value, float) and name not in model
+    and name not in aliases)
+
+dtype = np.dtype([
+    ('index', int),
+    ('name', 'U12'),
+    ('lifetime', float),    # years
+    ('molwt', float),       # g/mol
+    ('radeff', float),      # W/m2/ppb
+    ('preindconc', float),  # ppm for CO2, ppb for CH4 and N2O, otherwise ppt
+    ('cl_atoms', int),
+    ('br_atoms', int),
+    ('fracrel', float),
+])
+
+registry = np.array([(
+    i,
+    name,
+    getattr(lifetime, name),
+    getattr(molwt, name),
+    getattr(radeff, name),
+    getattr(preindconc, name),
+    getattr(cl_atoms, name, 0),
+    getattr(br_atoms, name, 0),
+    getattr(fracrel, name, 0.),
+    ) for i, name in enumerate(names)], dtype=dtype)
+registry.setflags(write=False)
+
+index = {name: i for i, name in enumerate(names)}
+index.update({alias: index[name] for alias, name in aliases.items()})
+index = MappingProxyType(index)
+
+
+def lookup(species):
+    """Registry row index (or array of indices) of named species.
+
+    Raises ValueError for species not in the registry.
+    """
+    if isinstance(species, str):
+        try:
+            return index[species.upper()]
+        except KeyError:
+            raise ValueError(species + ' is not in the list of recognised '+
+              'greenhouse gases')
+    species = np.asarray(species, dtype=str)
+    unique, inverse = np.unique(np.char.upper(species), return_inverse=True)
+    rows = np.zeros(len(unique), dtype=int)
+    for i, name in enumerate(unique):
+        if name not in index:
+            raise ValueError(name + ' is not in the list of recognised '+
+              'greenhouse gases')
+        rows[i] = index[name]
+    return rows[inverse].reshape(species.shape)
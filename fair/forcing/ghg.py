@@ -2,7 +2,7 @@ from __future__ import division
 
 import numpy as np
 
-from ..constants import radeff
+from ..constants.species import registry, nmodel
 
 def etminan(C, Cpi, F2x=3.71, scale_F2x=True):
     """Calculate the radiative forcing from CO2, CH4 and N2O.
@@ -99,4 +99,4 @@ def minor_gases(C, Cpi):
         28 element array of minor GHG forcings
     """
 
-    return (C - Cpi) * radeff.aslist[3:] * 0.001
+    return (C - Cpi) * registry['radeff'][3:nmodel] * 0.001
@@ -1,5 +1,10 @@
 import numpy as np
 
-def cumulative(emissions, aCO2land=-0.00113789):
+def cumulative(emissions, aCO2land=-0.00113789, dt=1, E0=0.):
+    """Land use forcing scaled with cumulative land use CO2 emissions.
+
+    E0 is the cumulative land use CO2 emissions before the first timestep,
+    for restarted runs.
+    """
     E_CO2land = emissions[:,2]
-    return np.cumsum(E_CO2land) * aCO2land
+    return np.cumsum(np.append(E0, E_CO2land * dt))[1:] * aCO2land
@@ -1,7 +1,7 @@
 from __future__ import division
 
 import numpy as np
-from ..constants import cl_atoms, br_atoms, fracrel
+from ..constants.species import registry, ods
 
 def magicc(C_ODS,
            C0, 
@@ -9,9 +9,9 @@ def magicc(C_ODS,
            eta2=2.05401270e-3,
            eta3=1.03143308):
 
-    Cl = np.array(cl_atoms.aslist)
-    Br = np.array(br_atoms.aslist)
-    FC = np.array(fracrel.aslist)
+    Cl = registry['cl_atoms'][ods]
+    Br = registry['br_atoms'][ods]
+    FC = registry['fracrel'][ods]
 
     EESC = (np.sum(Cl * 1000.*(C_ODS-C0) * FC/FC[0]) +
              45*np.sum(Br * 1000.*(C_ODS-C0) * FC/FC[0])) * FC[0]
@@ -1,14 +1,13 @@
 from __future__ import division
 
 import numpy as np
-from scipy.optimize import root
 
 from ..constants.general import ppm_gtc
 
 """Carbon cycle function from FaIR v1.0.0."""
 
 def carbon_cycle(e0, c_acc0, temp, r0, rc, rt, iirf_max, time_scale_sf0, a, tau,
-    iirf_h, carbon_boxes0, c_pi, c0, e1):
+    iirf_h, carbon_boxes0, c_pi, c0, e1, dt=1, alpha_table=None):
     """Calculates CO2 concentrations from emissions.
 
     Inputs:
@@ -32,6 +31,16 @@ def carbon_cycle(e0, c_acc0, temp, r0, rc, rt, iirf_max, time_scale_sf0, a, tau,
         c0            : concentration of CO2 in timestep t-1, ppmv
         e1            : emissions of CO2 in timestep t, GtC
 
+    Keywords:
+        dt            : length of timestep, years. A timestep longer than one
+                        year is equivalent to dt annual steps with a constant
+                        scale factor and emissions varying linearly from e0
+                        to e1.
+        alpha_table   : (2, n) array of time-integrated airborne fraction
+                        and scale factor from alpha_table(a, tau, iirf_h).
+                        If given, the scale factor is interpolated from it
+                        rather than solved for.
+
     Outputs:
         c1            : concentrations of CO2 in timestep t, ppmv
         c_acc1        : cumulative airborne carbon anomaly (GtC) since
@@ -41,15 +50,53 @@ def carbon_cycle(e0, c_acc0, temp, r0, rc, rt, iirf_max, time_scale_sf0, a, tau,
         time_scale_sf : scale factor for CO2 decay constants
     """
     iirf = _iirf_simple(c_acc0, temp, r0, rc, rt, iirf_max)
-    time_scale_sf = root(_iirf_interp, time_scale_sf0,
-      args=(a, tau, iirf_h, iirf))['x']
+    if alpha_table is not None:
+        time_scale_sf = np.exp(np.interp(iirf, alpha_table[0],
+          np.log(alpha_table[1])))
+    else:
+        # scipy is imported on first use to keep importing fair fast
+        from scipy.optimize import root
+        time_scale_sf = root(_iirf_interp, time_scale_sf0,
+          args=(a, tau, iirf_h, iirf))['x']
     tau_new = tau * time_scale_sf
-    carbon_boxes1 = carbon_boxes0*np.exp(-1.0/tau_new) + a*e1 / ppm_gtc
+    # mean of the end-of-year emissions within the timestep; e1 if dt=1
+    e_step = e1 + (e0 - e1) * (dt - 1) / (2 * dt)
+    decay = np.exp(-dt/tau_new)
+    carbon_boxes1 = carbon_boxes0*decay + a*e_step / ppm_gtc * (
+      (1.0 - decay)/(1.0 - np.exp(-1.0/tau_new)))
     c1 = np.sum(carbon_boxes1) + c_pi
-    c_acc1 = c_acc0 + 0.5*(e1 + e0) - (c1 - c0)*ppm_gtc
+    c_acc1 = c_acc0 + 0.5*(e1 + e0)*dt - (c1 - c0)*ppm_gtc
     return c1, c_acc1, carbon_boxes1, time_scale_sf
 
 
+def alpha_table(a, tau, iirf_h, n=8001):
+    """Table of the CO2 decay time constant scale factor against iIRF.
+
+    The scale factor alpha depends on the model state only through the
+    target time-integrated airborne fraction, so for fixed carbon cycle
+    parameters it can be tabulated once and interpolated in every timestep
+    of every run instead of being solved for. Scale factors are spaced
+    logarithmically from 1e-4 to 1e4; interpolation errors are below 1e-6
+    relative.
+
+    Inputs:
+        a        : partition fractions for CO2 boxes
+        tau      : time constants for CO2 boxes
+        iirf_h   : time horizon for time-integrated airborne fraction
+
+    Keywords:
+        n        : number of table entries
+
+    Outputs:
+        (2, n) array of time-integrated airborne fraction (increasing) and
+        the corresponding scale factor
+    """
+    alpha = np.logspace(-4, 4, n)
+    iirf = alpha * np.sum(a*tau*(1.0 - np.exp(-iirf_h/(tau*alpha[:,None]))),
+      axis=-1)
+    return np.array([iirf, alpha])
+
+
 def _iirf_interp(alp_b,a,tau,iirf_h,targ_iirf):
     """Interpolation function for finding alpha, the CO2 decay time constant
     scaling factor, in iirf_h equation. See Eq. (7) of Millar et al ACP (2017).
@@ -1,7 +1,6 @@
 from __future__ import division
 
 import numpy as np
-from scipy.optimize import root
 from .gas_cycle.fair1 import _iirf_simple, _iirf_interp
 from .forcing.ghg import co2_log
 from .defaults import carbon, thermal
@@ -60,7 +59,8 @@ def inverse_carbon_cycle(c1, c_acc0, temp, r0, rc, rt, iirf_max, time_scale_sf,
                         t (GtC)
         time_scale_sf : scale factor for CO2 decay constants
     """
-     
+    # scipy is imported on first use to keep importing fair fast
+    from scipy.optimize import root
 
     iirf = _iirf_simple(c_acc0, temp, r0, rc, rt, iirf_max)
     time_scale_sf = root(_iirf_interp, time_scale_sf,
@@ -179,6 +179,7 @@ def inverse_fair_scm(
         F[0]          = co2_log(C[0], C_pi, F2x=F2x) + other_rf[0]
         T_j[0,:]      = forcing_to_temperature(T_j_minus1, q[0,:], d, F[0])
     else:
+        from scipy.optimize import root
         emissions[0]  = root(infer_emissions, 0., args=(C[0], R_i[0,:],
             tau, a, C_pi))['x']
         F[0]          = co2_log(C[0], C_pi, F2x=F2x) + other_rf[0]
@@ -2,7 +2,7 @@ from __future__ import division
 
 import numpy as np
 
-def forcing_to_temperature(t0, q, d, f, e=1.0):
+def forcing_to_temperature(t0, q, d, f, e=1.0, dt=1, f0=None):
     """Calculate temperature from a given radiative forcing.
 
     This follows the forcing to temperature function described in Millar et
@@ -19,12 +19,21 @@ def forcing_to_temperature(t0, q, d, f, e=1.0):
     Keywords:
         e: efficacy factor (default 1); if f is an array, e should be an array
            of the same length.
+        dt: length of timestep, years. A timestep longer than one year is
+           equivalent to dt annual steps.
+        f0: radiative forcing in timestep t-1. If given, forcing is assumed
+           to vary linearly from f0 to f within a multi-year timestep,
+           otherwise it is held constant at f.
 
     Outputs:
         t1: slow and fast contributions to total temperature (2 element array)
         in timestep t
     """
-    t1 = t0*np.exp(-1.0/d) + q*(1.0-np.exp((-1.0)/d))*np.sum(f*e)
+    if f0 is not None:
+        # mean of the end-of-year forcing within the timestep; f if dt=1
+        f = f + (f0 - f) * (dt - 1) / (2 * dt)
+    decay = np.exp(-dt/d)
+    t1 = t0*decay + q*(1.0-decay)*np.sum(f*e)
     return t1
 
 
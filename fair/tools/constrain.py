@@ -1,7 +1,107 @@
 from __future__ import division
 
+import os
 import numpy as np
+from functools import lru_cache
 from scipy import stats
+from scipy.special import logsumexp
+
+from .._cache import loadtxt
+
+
+class HistTemp(object):
+    """Historical temperature trend constraint.
+
+    Uses the method of Thompson et al., 2015, also used in IPCC AR5 to derive
+    temperature trends which includes autocorrelation. The regression slope of
+    the observations and its uncertainty are calculated once on construction;
+    model temperatures are then tested against them with accept(), which
+    takes a whole ensemble at once.
+
+    Reference: J. Climate, 28, 6443-6456 10.1175/JCLI-D-14-00830.1
+
+    inputs:
+        Tobs: observed temperature time series. Numpy array
+        years: Numpy array of years covered by Tobs
+
+    keywords:
+        inflate: True (default) if the uncertainty bounds should be inflated
+            for lag-1 autocorrelation - as used in Thompson.
+        CI: confidence interval around the mean regression slope to count as
+            constrained. Default 0.9.
+
+    attributes:
+        slope_o: regression slope of observed temperature
+        intercept_o: intercept of observed temperature
+        CI_o: half-width of the accepted range of slopes
+        sd_o: standard error of the observed slope, inflated for
+            autocorrelation if requested
+    """
+
+    def __init__(self, Tobs, years, inflate=True, CI=0.9):
+        self.years = np.asarray(years, dtype=float)
+        Tobs = np.asarray(Tobs, dtype=float)
+        n = float(len(self.years))
+
+        # detrend the 1880-2016 observations and apply the internal
+        # variability estimate as detailed in eq. 8 of Thompson et al,
+        # J. Climate 2015
+
+        self.slope_o, self.intercept_o, _, _, _ = stats.linregress(
+          self.years, Tobs)
+        resid = self.slope_o * self.years + self.intercept_o - Tobs
+        s = np.std(resid, ddof=2)
+        if inflate:
+            lag1ac = np.corrcoef(resid[:-1],resid[1:])[1,0]
+        else:
+            lag1ac = 0
+        gamma = np.sqrt( n / ((n-2) * (1-lag1ac)/(1+lag1ac) - 2 ))
+        g = np.sqrt(12./(n**3 - n))
+        tcrit = stats.t.ppf(1-(1-CI)/2.0, df=n)
+        self.CI_o = s * gamma * tcrit * g
+        self.sd_o = s * gamma * g
+
+        # least squares weights: slope_m = Tmodel @ self._w
+        self._xmean = np.mean(self.years)
+        x = self.years - self._xmean
+        self._w = x / np.sum(x**2)
+
+    def slopes(self, Tmodel):
+        """Regression slopes and intercepts of modelled temperatures.
+
+        inputs:
+            Tmodel: (nt,) or (n_members, nt) array of modelled temperatures
+                over the years of the observations
+
+        returns:
+            slope_m, intercept_m: arrays of shape Tmodel.shape[:-1]
+        """
+        Tmodel = np.asarray(Tmodel, dtype=float)
+        if Tmodel.shape[-1] != len(self.years):
+            raise ValueError('Tmodel should have ' + str(len(self.years)) +
+              ' time points on its last axis, got shape ' + str(Tmodel.shape))
+        slope_m = Tmodel @ self._w
+        intercept_m = np.mean(Tmodel, axis=-1) - slope_m * self._xmean
+        return slope_m, intercept_m
+
+    def accept(self, Tmodel):
+        """Checks which ensemble members fall in observational uncertainty.
+
+        inputs:
+            Tmodel: (nt,) or (n_members, nt) array of modelled temperatures
+                over the years of the observations
+
+        returns:
+            accept: boolean array of shape Tmodel.shape[:-1], True where the
+                trend of the member agrees with observations
+            slope_m: regression slope of modelled temperature
+            intercept_m: intercept of modelled temperature
+        """
+        slope_m, intercept_m = self.slopes(Tmodel)
+        accept = ((self.slope_o-self.CI_o <= slope_m) &
+          (slope_m <= self.slope_o+self.CI_o))
+        return accept, slope_m, intercept_m
+
 
 def hist_temp(Tobs, Tmodel, years, inflate=True, CI=0.9):
     """Checks to see whether model-derived temperatures fall in observational
@@ -11,6 +111,8 @@ def hist_temp(Tobs, Tmodel, years, inflate=True, CI=0.9):
     temperature trends which includes autocorrelation. The regression slope of
     the observations is compared to the regression slope of the model. If the
     trend of the model is within observational uncertainty, the test passes.
+    To test many ensemble members against the same observations use HistTemp,
+    which calculates the observational trend only once.
 
     Reference: J. Climate, 28, 6443-6456 10.1175/JCLI-D-14-00830.1
 
@@ -33,28 +135,235 @@ def hist_temp(Tobs, Tmodel, years, inflate=True, CI=0.9):
         intercept_o: intercept of observed temperature
     """
 
-    n = float(len(years))
-
-    # detrend the 1880-2016 observations and apply the internal variability
-    # estimate as detailed in eq. 8 of Thompson et al, J. Climate 2015
-
-    slope_o, intercept_o, _, _, stderr_o = stats.linregress(years,Tobs)
-    resid = slope_o * years + intercept_o - Tobs
-    s = np.std(resid, ddof=2)
-    if inflate:
-        lag1ac = np.corrcoef(resid[:-1],resid[1:])[1,0]
-    else:
-        lag1ac = 0
-    gamma = np.sqrt( n / ((n-2) * (1-lag1ac)/(1+lag1ac) - 2 ))
-    g = np.sqrt(12./(n**3 - n))
-    tcrit = stats.t.ppf(1-(1-CI)/2.0, df=n)
-    CI_o = s * gamma * tcrit * g
-
-    # check modelled T against observed
-    slope_m,intercept_m,_,_,stderr_m = stats.linregress(years, Tmodel)
-
-    if slope_o-CI_o <= slope_m <= slope_o+CI_o:
-        accept = True
-    else:
-        accept = False
-    return accept, slope_m, intercept_m, slope_o, intercept_o
+    constraint = HistTemp(Tobs, years, inflate=inflate, CI=CI)
+    accept, slope_m, intercept_m = constraint.accept(Tmodel)
+    return (bool(accept), slope_m, intercept_m, constraint.slope_o,
+      constraint.intercept_o)
+
+
+@lru_cache(maxsize=1)
+def _hadcrut4():
+    return loadtxt(os.path.join(os.path.dirname(__file__), 'tempobs',
+      'had4_krig_annual_v2_0_0.csv'))
+
+
+def hadcrut4():
+    """Annual HadCRUT4 (Cowtan and Way kriged) temperature anomalies bundled
+    in tools/tempobs.
+
+    returns:
+        years: (nt,) array of years
+        Tobs: (nt,) array of temperature anomalies, K
+    """
+    data = _hadcrut4()
+    return data[:,0], data[:,1]
+
+
+def anomaly(x, years, period, baseline=None):
+    """Mean of a time series over a period, relative to a baseline period.
+
+    inputs:
+        x: (..., nt) array, e.g. (n_members, nt) temperatures
+        years: (nt,) array of years of x
+        period: (first, last) years of period to average, inclusive
+
+    keywords:
+        baseline: (first, last) years of baseline period, inclusive. Default
+            is no baseline.
+
+    returns:
+        array of shape x.shape[:-1]
+    """
+    x = np.asarray(x)
+    years = np.asarray(years)
+
+    def _mean(first_last):
+        mask = (years >= first_last[0]) & (years <= first_last[1])
+        if not np.any(mask):
+            raise ValueError('no years between ' + str(first_last[0]) +
+              ' and ' + str(first_last[1]))
+        return np.mean(x[..., mask], axis=-1)
+
+    if baseline is None:
+        return _mean(period)
+    return _mean(period) - _mean(baseline)
+
+
+class Likelihood(object):
+    """Importance weights of an ensemble from observational constraints.
+
+    Rather than accepting or rejecting members, each member is weighted by
+    the likelihood of the observations given its model diagnostics. Each
+    observation contributes an independent Gaussian log-likelihood term.
+    Model diagnostics and log-likelihoods are kept for every observation, so
+    changing an observational dataset recalculates only its own term and
+    never requires re-running the model.
+
+    inputs:
+        n: number of ensemble members
+    """
+
+    def __init__(self, n):
+        self.n = n
+        self.diagnostics = {}
+        self.observations = {}
+        self.loglikes = {}
+
+    def observe(self, name, model, obs, sd):
+        """Adds or replaces an observational constraint.
+
+        inputs:
+            name: name of the constraint
+            model: (n,) or (n, k) array of the model diagnostic for each
+                member, e.g. CO2 concentration or OHC change in given years
+            obs: observed value(s), broadcastable against model
+            sd: standard deviation of the observations, broadcastable
+                against model
+
+        returns:
+            (n,) array of log-likelihoods of this constraint
+        """
+        model = np.asarray(model, dtype=float)
+        if model.shape[:1] != (self.n,):
+            raise ValueError('model diagnostic should have first dimension ' +
+              str(self.n) + ', got shape ' + str(model.shape))
+        self.diagnostics[name] = model
+        return self.update(name, obs, sd)
+
+    def observe_range(self, name, model, low, high, CI=0.9):
+        """Adds a constraint given as a range, e.g. an assessed ERF range.
+
+        The range is treated as a central confidence interval of a normal
+        distribution.
+
+        inputs:
+            name: name of the constraint
+            model: (n,) or (n, k) array of the model diagnostic
+            low, high: bounds of the range
+
+        keywords:
+            CI: confidence level of the range. Default 0.9, the 5-95% range.
+
+        returns:
+            (n,) array of log-likelihoods of this constraint
+        """
+        low = np.asarray(low, dtype=float)
+        high = np.asarray(high, dtype=float)
+        sd = (high - low) / (2 * stats.norm.ppf(0.5 + CI/2.0))
+        return self.observe(name, model, 0.5*(low + high), sd)
+
+    def observe_warming(self, T, years, Tobs=None, obs_years=None,
+        inflate=True):
+        """Adds a constraint on the observed warming trend.
+
+        Compares the least-squares temperature trend of each member with
+        the observed trend, using the uncertainty of the observed trend of
+        Thompson et al., 2015, as in HistTemp.
+
+        inputs:
+            T: (n, nt) array of modelled temperatures
+            years: (nt,) array of years of T
+
+        keywords:
+            Tobs: observed temperature time series. Default is the bundled
+                HadCRUT4 data.
+            obs_years: years of Tobs; needed if and only if Tobs is given
+            inflate: True (default) if the uncertainty should be inflated
+                for lag-1 autocorrelation
+
+        returns:
+            (n,) array of log-likelihoods of this constraint
+        """
+        if (Tobs is None) != (obs_years is None):
+            raise ValueError('Tobs and obs_years should be given together')
+        if Tobs is None:
+            obs_years, Tobs = hadcrut4()
+        years = np.asarray(years)
+        obs_years = np.asarray(obs_years)
+        idx = np.searchsorted(years, obs_years)
+        if np.any(idx >= len(years)) or np.any(years[np.minimum(idx,
+          len(years)-1)] != obs_years):
+            raise ValueError('years of T do not cover the observations')
+        constraint = HistTemp(Tobs, obs_years, inflate=inflate)
+        slope_m, _ = constraint.slopes(np.asarray(T)[:, idx])
+        return self.observe('warming', slope_m, constraint.slope_o,
+          constraint.sd_o)
+
+    def update(self, name, obs=None, sd=None):
+        """Changes the observations of an existing constraint.
+
+        Only the log-likelihood of this constraint is recalculated, from the
+        stored model diagnostic.
+
+        keywords:
+            obs: new observed value(s). Default is unchanged.
+            sd: new standard deviation. Default is unchanged.
+
+        returns:
+            (n,) array of log-likelihoods of this constraint
+        """
+        if name not in self.diagnostics:
+            raise ValueError(name + ' is not a constraint')
+        old_obs, old_sd = self.observations.get(name, (None, None))
+        obs = old_obs if obs is None else np.asarray(obs, dtype=float)
+        sd = old_sd if sd is None else np.asarray(sd, dtype=float)
+        if obs is None or sd is None:
+            raise ValueError('obs and sd are needed for a new constraint')
+        self.observations[name] = (obs, sd)
+        z = (self.diagnostics[name] - obs) / sd
+        loglike = -0.5 * z**2 - np.log(sd)
+        if loglike.ndim > 1:
+            loglike = np.sum(loglike.reshape((self.n, -1)), axis=1)
+        self.loglikes[name] = loglike
+        return loglike
+
+    def remove(self, name):
+        """Removes a constraint."""
+        del self.diagnostics[name]
+        del self.observations[name]
+        del self.loglikes[name]
+
+    def log_weights(self, names=None):
+        """Normalised log-weights of each member.
+
+        keywords:
+            names: constraints to use. Default is all.
+
+        returns:
+            (n,) array of log-weights, whose exponentials sum to one
+        """
+        if names is None:
+            names = list(self.loglikes)
+        total = np.zeros(self.n)
+        for name in names:
+            total = total + self.loglikes[name]
+        return total - logsumexp(total)
+
+    def weights(self, names=None):
+        """Normalised weights of each member. See log_weights."""
+        return np.exp(self.log_weights(names))
+
+    def ess(self, names=None):
+        """Effective sample size of the weighted ensemble (Kish)."""
+        return 1.0 / np.sum(self.weights(names)**2)
+
+    def resample(self, n=None, names=None, seed=None):
+        """Indices of members drawn in proportion to their weights.
+
+        Uses systematic resampling.
+
+        keywords:
+            n: number of members to draw. Default is the ensemble size.
+            names: constraints to use. Default is all.
+            seed: seed for the random offset, passed to
+                numpy.random.default_rng
+
+        returns:
+            (n,) array of member indices, in increasing order
+        """
+        if n is None:
+            n = self.n
+        cdf = np.cumsum(self.weights(names))
+        cdf[-1] = 1.0
+        u = (np.random.default_rng(seed).uniform() + np.arange(n)) / n
+        return np.searchsorted(cdf, u)
@@ -3,9 +3,89 @@ from __future__ import division
 import numpy as np
 import scipy.stats as st
 import os
+import multiprocessing
 from functools import reduce
+try:
+    from scipy.stats import qmc
+    has_qmc = True
+except ImportError:
+    has_qmc = False
 
-def mvlognorm(data, n=1000, seed=None, correlated=True):
+# Random variates are generated in fixed-size chunks of rows, each from its
+# own stream spawned from the seed, so any row range can be generated
+# independently and results do not depend on how generation is split up.
+_chunk_size = 65536
+
+
+def _seed_sequence(seed):
+    if isinstance(seed, np.random.SeedSequence):
+        return seed
+    return np.random.SeedSequence(seed)
+
+
+def _normal_chunk(args):
+    entropy, spawn_key, chunk, p = args
+    rng = np.random.default_rng(np.random.SeedSequence(entropy,
+      spawn_key=spawn_key + (chunk,)))
+    return rng.standard_normal((_chunk_size, p))
+
+
+def standard_normal(n, p, seed=None, start=0, workers=1):
+    """Independent standard normal variates from reproducible parallel
+    streams.
+
+    Row i of the output is row start+i of an unlimited sequence defined by
+    the seed. The sequence is generated in chunks of rows, each from an
+    independent numpy Generator spawned from numpy.random.SeedSequence(seed),
+    so results are identical however generation is split across calls or
+    worker processes.
+
+    Inputs:
+        n: number of rows
+        p: number of variables (columns)
+
+    Keywords:
+        seed: int, None or numpy.random.SeedSequence
+        start: index of the first row in the sequence
+        workers: number of processes to generate chunks in
+
+    Outputs:
+        (n, p) array of standard normal variates
+    """
+    seed = _seed_sequence(seed)
+    first = start // _chunk_size
+    last = (start + n - 1) // _chunk_size + 1 if n > 0 else first
+    tasks = [(seed.entropy, tuple(seed.spawn_key), chunk, p)
+      for chunk in range(first, last)]
+    if workers > 1 and len(tasks) > 1:
+        with multiprocessing.Pool(min(workers, len(tasks))) as pool:
+            chunks = pool.map(_normal_chunk, tasks)
+    else:
+        chunks = [_normal_chunk(task) for task in tasks]
+    if not chunks:
+        return np.zeros((0, p))
+    offset = start - first * _chunk_size
+    return np.concatenate(chunks)[offset:offset+n]
+
+
+def _mvlognorm_fit(data, correlated):
+    """Location and matrix square root of covariance of log data."""
+    p = data.shape[1]
+    mu = np.mean(data, axis=0)
+    Sigma = np.var(data, axis=0)
+    if correlated:
+        corr = np.corrcoef(np.log(data), rowvar=False)
+    else:
+        corr = np.eye((p))
+    
+    alpha = np.log(mu) - 0.5*np.log(1.0 + Sigma/mu**2)
+    beta = np.diag(np.log(1.0 + Sigma/(mu**2)))
+    
+    delta = reduce(np.matmul, [np.sqrt(beta), corr, np.sqrt(beta)])
+    return alpha, _sqrtm(delta)
+
+
+def mvlognorm(data, n=1000, seed=None, correlated=True, workers=1):
     """Returns joint lognormal random variables.
     
     Inputs:
@@ -14,10 +94,12 @@ def mvlognorm(data, n=1000, seed=None, correlated=True):
             estimate.
         
     Keywords:
-        n: number of 
-        seed: random seed for variable generation
+        n: number of samples to generate
+        seed: random seed for variable generation; see standard_normal
         correlated: logical. If True, assume random variables are
             correlated, and calculate the correlation coefficient.
+        workers: number of processes to generate random variates in. The
+            result does not depend on the number of workers.
         
     Outputs:
         (n, p) array of simulated joint lognormal random variables.
@@ -30,33 +112,254 @@ def mvlognorm(data, n=1000, seed=None, correlated=True):
     It is based on the MethylCapSig R package by Deepak N. Ayyala et al.,
     https://CRAN.R-project.org/package=MethylCapSig
     """
-    
-    p = data.shape[1]
-    mu = np.mean(data, axis=0)
-    Sigma = np.var(data, axis=0)
-    if correlated:
-        corr = np.corrcoef(np.log(data), rowvar=False)
+    alpha, root_delta = _mvlognorm_fit(data, correlated)
+    out = standard_normal(n, data.shape[1], seed=seed, workers=workers)
+    return np.exp(alpha + np.matmul(out, root_delta.T))
+
+
+def _sqrtm(a):
+    """Symmetric square root of a symmetric positive semi-definite matrix."""
+    eigenvalues, eigenvectors = np.linalg.eigh(a)
+    eigenvalues = np.clip(eigenvalues, 0, None)
+    return np.matmul(eigenvectors * np.sqrt(eigenvalues), eigenvectors.T)
+
+
+def _marginals(mean, sd, dist):
+    """Location and scale of the underlying normal for each parameter."""
+    mean = np.atleast_1d(np.asarray(mean, dtype=float))
+    sd = np.broadcast_to(np.asarray(sd, dtype=float), mean.shape)
+    if isinstance(dist, str):
+        dist = [dist] * len(mean)
+    dist = np.array([d.lower() for d in dist])
+    if len(dist) != len(mean):
+        raise ValueError('dist should be a string or have one entry per '+
+          'parameter')
+    if not np.all(np.isin(dist, ['norm', 'lognorm'])):
+        raise ValueError('dist should be "norm" or "lognorm"')
+    lognorm = dist=='lognorm'
+    if np.any(mean[lognorm]==0):
+        raise ValueError('lognorm parameters cannot have zero mean')
+
+    # lognormal parameters with negative means are sampled as the negative
+    # of a lognormal variable
+    sign = np.where(lognorm, np.sign(mean), 1.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sigma2 = np.log(1.0 + sd**2/mean**2)
+        loc = np.where(lognorm, np.log(np.abs(mean)) - 0.5*sigma2, mean)
+    scale = np.where(lognorm, np.sqrt(sigma2), sd)
+    return loc, scale, sign, lognorm
+
+
+def joint_transform(z, mean, sd, corr=None, dist='lognorm'):
+    """Maps standard normal variates onto a joint parameter distribution.
+
+    This is the Gaussian copula used by joint_sample, exposed so that any
+    design of independent standard normal points (pseudo-random or
+    quasi-random) can be mapped onto the parameter space.
+
+    Inputs:
+        z: (n, p) array of independent standard normal variates
+        mean: (p,) array of parameter means
+        sd: (p,) array (or scalar) of parameter standard deviations
+
+    Keywords:
+        corr: (p, p) correlation matrix of the underlying normal variables.
+            Default is uncorrelated.
+        dist: 'norm' or 'lognorm', or a sequence of these giving the marginal
+            distribution of each parameter.
+
+    Outputs:
+        (n, p) array of parameter samples
+    """
+    loc, scale, sign, lognorm = _marginals(mean, sd, dist)
+    z = np.asarray(z, dtype=float)
+    if corr is not None:
+        z = np.matmul(z, _sqrtm(np.asarray(corr, dtype=float)).T)
+    y = loc + scale * z
+    return np.where(lognorm, sign * np.exp(y), y)
+
+
+def joint_sample(mean, sd, n=1000, corr=None, dist='lognorm', seed=None,
+    workers=1):
+    """Returns joint normal or lognormal samples of a parameter vector.
+
+    Any set of FaIR parameters can be sampled together, for example the
+    carbon cycle parameters r0, rc and rt, F2x and the aerosol and ozone
+    coefficients in b_aero and b_tro3. Samples are generated with a single
+    matrix multiply, so very large ensembles are cheap.
+
+    Inputs:
+        mean: (p,) array of parameter means
+        sd: (p,) array (or scalar) of parameter standard deviations
+
+    Keywords:
+        n: number of samples to generate. Default 1000.
+        corr: (p, p) correlation matrix of the underlying normal variables.
+            Default is uncorrelated.
+        dist: 'norm' or 'lognorm' (default), or a sequence of these giving
+            the marginal distribution of each parameter. Lognormal
+            parameters with negative means are sampled as the negative of a
+            lognormal variable.
+        seed: random seed for generating variables; see standard_normal
+        workers: number of processes to generate random variates in. The
+            result does not depend on the number of workers.
+
+    Outputs:
+        (n, p) array of parameter samples
+    """
+    p = len(np.atleast_1d(mean))
+    z = standard_normal(n, p, seed=seed, workers=workers)
+    return joint_transform(z, mean, sd, corr=corr, dist=dist)
+
+
+def _halton(n, p, rng):
+    """Randomly shifted Halton sequence, used if scipy.stats.qmc is missing."""
+    primes = []
+    candidate = 2
+    while len(primes) < p:
+        if all(candidate % prime for prime in primes):
+            primes.append(candidate)
+        candidate = candidate + 1
+    out = np.zeros((n, p))
+    index = np.arange(1, n+1)
+    for j, base in enumerate(primes):
+        remaining = index.copy()
+        fraction = 1.0
+        while np.any(remaining > 0):
+            fraction = fraction / base
+            out[:,j] = out[:,j] + fraction * (remaining % base)
+            remaining = remaining // base
+    # Cranley-Patterson rotation
+    return (out + rng.uniform(size=p)) % 1.0
+
+
+def _latin_hypercube(n, p, rng):
+    """Latin hypercube, used if scipy.stats.qmc is missing."""
+    strata = np.argsort(rng.uniform(size=(p, n)), axis=1).T
+    return (strata + rng.uniform(size=(n, p))) / n
+
+
+def design(n, p, method='sobol', seed=None):
+    """Space-filling designs in the unit hypercube.
+
+    Quasi-Monte Carlo and Latin hypercube designs converge faster than
+    pseudo-random sampling for ensemble statistics such as percentiles.
+    Designs are randomised (scrambled Sobol, scrambled or shifted Halton,
+    randomly permuted Latin hypercube) so they contain no points on the
+    boundary of the hypercube.
+
+    Inputs:
+        n: number of points. Sobol designs are best with a power of 2.
+        p: number of dimensions (parameters)
+
+    Keywords:
+        method: 'sobol', 'halton', 'lhs' or 'random'
+        seed: random seed for the randomisation, passed to
+            numpy.random.default_rng
+
+    Outputs:
+        (n, p) array of points in (0, 1)
+    """
+    method = method.lower()
+    rng = np.random.default_rng(seed)
+    if method=='random':
+        u = rng.uniform(size=(n, p))
+    elif method=='sobol':
+        if not has_qmc:
+            raise ImportError('Sobol designs require scipy>=1.7')
+        u = qmc.Sobol(p, seed=rng).random(n)
+    elif method=='halton':
+        if has_qmc:
+            u = qmc.Halton(p, seed=rng).random(n)
+        else:
+            u = _halton(n, p, rng)
+    elif method=='lhs':
+        if has_qmc:
+            u = qmc.LatinHypercube(p, seed=rng).random(n)
+        else:
+            u = _latin_hypercube(n, p, rng)
     else:
-        corr = np.eye((p))
-    
-    alpha = np.log(mu) - 0.5*np.log(1.0 + Sigma/mu**2)
-    beta = np.diag(np.log(1.0 + Sigma/(mu**2)))
-    
-    delta = reduce(np.matmul, [np.sqrt(beta), corr, np.sqrt(beta)])
-    delta_eigenvalues, delta_eigenvectors = np.linalg.eig(delta)
-    root_delta = reduce(np.matmul, 
-      [delta_eigenvectors, np.diag(np.sqrt(delta_eigenvalues)), delta_eigenvectors.T])
+        raise ValueError('method should be "sobol", "halton", "lhs" or '+
+          '"random"')
+    eps = np.finfo(float).eps
+    return np.clip(u, eps, 1-eps)
+
+
+def design_sample(mean, sd, n=1024, corr=None, dist='lognorm',
+    method='sobol', seed=None):
+    """Joint parameter samples from a space-filling design.
+
+    This is the design-based counterpart of joint_sample: points of the
+    design are mapped to standard normal variates and through the same
+    marginal and copula transform (joint_transform). Any set of FaIR
+    parameters can be included, e.g. TCR and ECS (see tcrecs_fit), r0, rc,
+    rt, F2x, forcing scale factors, b_aero and ghan_params.
+
+    Inputs:
+        mean: (p,) array of parameter means
+        sd: (p,) array (or scalar) of parameter standard deviations
+
+    Keywords:
+        n: number of samples. Default 1024.
+        corr: (p, p) correlation matrix of the underlying normal variables.
+            Default is uncorrelated.
+        dist: 'norm' or 'lognorm' (default), or a sequence of these giving
+            the marginal distribution of each parameter.
+        method: 'sobol' (default), 'halton', 'lhs' or 'random'
+        seed: random seed for the design randomisation
+
+    Outputs:
+        (n, p) array of parameter samples
+    """
+    p = len(np.atleast_1d(mean))
+    z = st.norm.ppf(design(n, p, method=method, seed=seed))
+    return joint_transform(z, mean, sd, corr=corr, dist=dist)
+
+
+def _tcrecs_data(tcrecs_in):
+    if type(tcrecs_in) is str and tcrecs_in=='cmip5':
+        filepath = os.path.join(os.path.dirname(__file__),
+          'tcrecs/cmip5tcrecs.csv')
+        tcrecs_in = np.loadtxt(filepath, delimiter=',', skiprows=3)
+    try:
+        assert(type(tcrecs_in) is np.ndarray)
+        assert(tcrecs_in.ndim == 2)
+        assert(tcrecs_in.shape[1] == 2)
+    except AssertionError:
+        raise ValueError('tcrecs_in should "cmip5" or an array of shape (n, 2)')
+    return tcrecs_in
+
 
-    out = st.norm.rvs(size=(n,p), random_state=seed)
-    for i in range(n):
-        out[i,:] = np.exp(alpha[:] + np.matmul(root_delta, out[i,:]))
+def tcrecs_fit(tcrecs_in='cmip5', correlated=True):
+    """Joint lognormal fit of TCR and ECS for use with joint_sample.
 
-    return out
+    This is the fit used by mvlognorm and tcrecs_generate with the default
+    lognormal distribution.
+
+    Inputs:
+        tcrecs_in: either 'cmip5' for pre-shipped CMIP5 TCR and ECS values,
+            or a 2-column array of TCR and ECS values to fit.
+
+    Keywords:
+        correlated: logical. If True (default), include the correlation of
+            log TCR and log ECS.
+
+    Outputs:
+        mean: mean of TCR and ECS
+        sd: standard deviation of TCR and ECS
+        corr: (2, 2) correlation matrix of the underlying normal variables
+    """
+    tcrecs_in = _tcrecs_data(tcrecs_in)
+    if correlated:
+        corr = np.corrcoef(np.log(tcrecs_in), rowvar=False)
+    else:
+        corr = np.eye(2)
+    return np.mean(tcrecs_in, axis=0), np.std(tcrecs_in, axis=0), corr
 
 
 def tcrecs_generate(tcrecs_in='cmip5', dist='lognorm', n=1000, correlated=True,
                     strip_ecs_lt_tcr=True,
-                    seed=None):
+                    seed=None, workers=1):
     """Generates a distribution of TCR and ECS.
     
     Inputs:
@@ -73,54 +376,59 @@ def tcrecs_generate(tcrecs_in='cmip5', dist='lognorm', n=1000, correlated=True,
             inputs are correlated. The function calculates the
             correlation coefficient automatically.
         strip_ecs_lt_tcr: logical. If True (default), remove values
-            where ECS < TCR in place (but still return n samples.)
-        seed: random seed for generating variables.
+            where ECS < TCR and replace them with further draws from the
+            same fitted distribution (still returning n samples).
+        seed: random seed for generating variables; see standard_normal
+        workers: number of processes to generate random variates in. The
+            result does not depend on the number of workers.
 
     Output:
         (n, 2) array of sampled ECS, TCR pairs."""
     
-    if type(tcrecs_in) is str and tcrecs_in=='cmip5':
-        filepath = os.path.join(os.path.dirname(__file__),
-          'tcrecs/cmip5tcrecs.csv')
-        tcrecs_in = np.loadtxt(filepath, delimiter=',', skiprows=3)
-    try:
-        assert(type(tcrecs_in) is np.ndarray)
-        assert(tcrecs_in.ndim == 2)
-        assert(tcrecs_in.shape[1] == 2)
-    except AssertionError:
-        raise ValueError('tcrecs_in should "cmip5" or an array of shape (n, 2)')
-    
+    tcrecs_in = _tcrecs_data(tcrecs_in)
     dist = dist.lower()
     
-    def _genvar(tcrecs, dist, n, seed, correlated):
-        if dist=='lognorm':
-            out = mvlognorm(tcrecs, n=n, seed=seed, correlated=correlated)
-        elif dist=='norm':
-            mu = np.mean(tcrecs, axis=0)
-            if correlated:
-                cov = np.cov(tcrecs, rowvar=False)
-            else:
-                cov = np.diag(np.var(tcrecs, axis=0))
-            out = st.multivariate_normal.rvs(mu, cov, size=n, random_state=seed)
+    if dist=='lognorm':
+        alpha, root = _mvlognorm_fit(tcrecs_in, correlated)
+    elif dist=='norm':
+        alpha = np.mean(tcrecs_in, axis=0)
+        if correlated:
+            cov = np.cov(tcrecs_in, rowvar=False)
         else:
-            raise ValueError('dist should be "norm" or "lognorm"')
+            cov = np.diag(np.var(tcrecs_in, axis=0))
+        root = _sqrtm(cov)
+    else:
+        raise ValueError('dist should be "norm" or "lognorm"')
+    seed = _seed_sequence(seed)
+
+    def _genvar(n, start):
+        out = alpha + np.matmul(standard_normal(n, 2, seed=seed, start=start,
+          workers=workers), root.T)
+        if dist=='lognorm':
+            out = np.exp(out)
         return out
 
-    tcrecs_out = _genvar(tcrecs_in, dist, n, seed, correlated)
+    # all draws come from one sequence, so the output is deterministic for a
+    # given seed and the first n draws are the same as with no stripping
+    tcrecs_out = _genvar(n, 0)
     
     if strip_ecs_lt_tcr:
-        tcrecs_out = np.delete(tcrecs_out, 
-          np.where(tcrecs_out[:,0] > tcrecs_out[:,1]), axis=0)
-        nreq = n - len(tcrecs_out[:,0])
-        while nreq>0:
-            # required otherwise we are repeating values
-            # this is still deterministic for constant ensemble size
-            if seed is not None:
-                seed = seed + nreq
-            new = _genvar(tcrecs_out, dist, n-len(tcrecs_out[:,0]),
-              seed, correlated)
-            tcrecs_out = np.append(tcrecs_out, new, axis=0)
-            tcrecs_out = np.delete(tcrecs_out, np.where(tcrecs_out[:,0] > 
-              tcrecs_out[:,1]), axis=0)
-            nreq = n - len(tcrecs_out[:,0])
+        tcrecs_out = tcrecs_out[tcrecs_out[:,0] <= tcrecs_out[:,1]]
+        nacc = len(tcrecs_out)
+        if nacc == 0:
+            raise ValueError('no samples with TCR <= ECS were generated')
+        # replace rejected samples by oversampling from the original fit
+        # using the measured acceptance rate, with a margin so that a second
+        # pass is rarely needed
+        rate = nacc / n
+        extra = [tcrecs_out]
+        start = n
+        while nacc < n:
+            nnew = int(np.ceil((n - nacc) / rate * 1.2)) + 10
+            new = _genvar(nnew, start)
+            start = start + nnew
+            new = new[new[:,0] <= new[:,1]]
+            extra.append(new)
+            nacc = nacc + len(new)
+        tcrecs_out = np.concatenate(extra)[:n]
     return tcrecs_out
@@ -0,0 +1,123 @@
+from __future__ import division
+
+import numpy as np
+from ..constants import molwt
+from .runner import run_ensemble, _split_timeseries
+
+# kg of emitted species per unit of each emissions column of fair_scm.
+# CO2 is expressed per kg CO2, N2O per kg N2O; SLCFs are per kg of the
+# species in which they are reported (e.g. kg S for SOx, kg N for NOx).
+_kg_per_unit = np.array(
+    [np.nan] +
+    [1e12 * molwt.CO2 / molwt.C] * 2 +
+    [1e9, 1e9 * molwt.N2O / molwt.N2] +
+    [1e9] * 7 +
+    [1e6] * 28
+)
+
+
+def impulse_response(emissions, species=None, pulse_years=None,
+    pulse_sizes=1.0, horizon=100, co2_pulse=1.0, workers=None, chunksize=None,
+    **kwargs):
+    """Emission metrics from pulse experiments run with the full model.
+
+    The baseline and every pulse experiment are stacked along a member axis
+    and integrated together with tools.runner.run_ensemble, up to the end of
+    the last horizon. Each perturbed run adds a single pulse of one species
+    in one year to the baseline emissions, and the response is the
+    difference from the one shared baseline run. A fossil CO2 pulse is run
+    in every pulse year as the reference gas.
+
+    Inputs:
+        emissions: (nt, 40) baseline emissions array in fair_scm format
+
+    Keywords:
+        species: index or list of indices of emissions columns to pulse (1 to
+            39). Default is all emitted species.
+        pulse_years: year or list of years in which to emit the pulse. Must
+            be in the first column of emissions. Default is the first year.
+        pulse_sizes: size or list of sizes of pulse, in the emissions units of
+            each column. Default 1.
+        horizon: number of years after the pulse to evaluate metrics over
+        co2_pulse: size of reference CO2 pulse, GtC
+        workers: number of worker processes, as in run_ensemble
+        chunksize: number of runs per task, as in run_ensemble
+        **kwargs: other arguments to pass to fair_scm
+
+    Returns:
+        dict with keys
+            horizons: (horizon,) array of time horizons 1 to horizon, years
+            agwp: absolute global warming potential, W m-2 yr kg-1
+            agtp: absolute global temperature change potential, K kg-1
+            iagtp: integrated AGTP, K yr kg-1
+            gwp: global warming potential relative to CO2
+            gtp: global temperature change potential relative to CO2
+            igtp: integrated GTP relative to CO2
+        Each metric has shape (nspecies, npulse_years, npulse_sizes, horizon)
+        in the order given.
+    """
+
+    emissions = np.asarray(emissions, dtype=float)
+    if emissions.ndim != 2 or emissions.shape[1] != 40:
+        raise ValueError('emissions should be a (nt, 40) array, got shape ' +
+          str(emissions.shape))
+    if species is None:
+        species = np.arange(1, 40)
+    species = np.atleast_1d(species)
+    if np.any(species < 1) or np.any(species > 39):
+        raise ValueError('species indices should be between 1 and 39')
+    years = emissions[:,0]
+    if pulse_years is None:
+        pulse_years = years[:1]
+    pulse_years = np.atleast_1d(pulse_years)
+    pulse_sizes = np.atleast_1d(pulse_sizes).astype(float)
+
+    pulse_idx = np.zeros(len(pulse_years), dtype=int)
+    for i, year in enumerate(pulse_years):
+        matches = np.nonzero(years == year)[0]
+        if len(matches) == 0:
+            raise ValueError('pulse year ' + str(year) +
+              ' not in emissions')
+        pulse_idx[i] = matches[0]
+        if pulse_idx[i] + horizon >= len(years):
+            raise ValueError('pulse year ' + str(year) + ' plus horizon ' +
+              str(horizon) + ' extends beyond end of emissions')
+
+    # the baseline is member 0, followed by the CO2 reference pulse in each
+    # pulse year and then every species, pulse year and size
+    runs = [(1, p, co2_pulse) for p in pulse_idx] + [(col, p, size)
+      for col in species for p in pulse_idx for size in pulse_sizes]
+    cols, idx, sizes = [np.array(x) for x in zip(*runs)]
+    members = np.arange(1, len(runs)+1)
+    # years after the last pulse horizon do not affect any metric
+    n_end = np.max(pulse_idx) + horizon + 1
+    perturbed = np.repeat(emissions[None,:n_end], len(runs)+1, axis=0)
+    perturbed[members,idx,cols] = perturbed[members,idx,cols] + sizes
+    kwargs = _split_timeseries(kwargs, n_end, len(years))[0]
+    C, F, T = run_ensemble(perturbed, workers=workers, chunksize=chunksize,
+      **kwargs)[:3]
+
+    F = np.sum(F, axis=2)
+    window = idx[:,None] + np.arange(horizon+1)
+    dF = F[members[:,None],window] - F[0,window]
+    dT = T[members[:,None],window] - T[0,window]
+    kg = (sizes * _kg_per_unit[cols])[:,None]
+    agwp = np.cumsum(dF, axis=1)[:,:-1] / kg
+    agtp = dT[:,1:] / kg
+    iagtp = np.cumsum(dT, axis=1)[:,:-1] / kg
+
+    n = len(pulse_years)
+    shape = (len(species), n, len(pulse_sizes), horizon)
+    agwp_co2, agwp = agwp[:n], agwp[n:].reshape(shape)
+    agtp_co2, agtp = agtp[:n], agtp[n:].reshape(shape)
+    iagtp_co2, iagtp = iagtp[:n], iagtp[n:].reshape(shape)
+
+    return {
+        'horizons': np.arange(1, horizon+1),
+        'agwp': agwp,
+        'agtp': agtp,
+        'iagtp': iagtp,
+        'gwp': agwp/agwp_co2[None,:,None,:],
+        'gtp': agtp/agtp_co2[None,:,None,:],
+        'igtp': iagtp/iagtp_co2[None,:,None,:],
+    }
@@ -1,7 +1,7 @@
 from __future__ import division
 
+import multiprocessing
 import numpy as np
-from scipy.interpolate import interp1d
 
 
 def _import_emis_file(rcp):
@@ -18,6 +18,48 @@ def _import_emis_file(rcp):
     return rcp_emis
 
 
+def _read_scen(filename):
+    """Reads the emissions table of a .SCEN file in a single pass.
+
+    Returns:
+        nt_scen x 24 numpy array, first column is the year
+    """
+    with open(filename) as f:
+        lines = f.read().splitlines()
+    # First line is the number of time steps in the SCEN file. The next 6
+    # lines are unused by FaIR, followed by the column headers and units.
+    nt = int(lines[0].strip())
+    values = ' '.join(lines[9:9+nt]).split()
+    try:
+        return np.array(values, dtype=float).reshape((nt, -1))
+    except ValueError:
+        raise ValueError(filename + ' should have ' + str(nt) + ' rows of ' +
+          'equal length after the 9 header lines')
+
+
+def _fill_years(data):
+    """Linearly interpolates rows of data to every year between the first
+    and last. The first column of data is the year."""
+    years = data[:,0]
+    full_years = np.arange(years[0], years[-1]+1)
+    if len(years) < 2:
+        return data.copy()
+    i = np.clip(np.searchsorted(years, full_years, side='right') - 1, 0,
+      len(years)-2)
+    w = ((full_years - years[i]) / (years[i+1] - years[i]))[:,None]
+    filled = data[i,1:] + w * (data[i+1,1:] - data[i,1:])
+    return np.hstack((full_years[:,None], filled))
+
+
+def _rcp_rows(rcp_emis, years):
+    """Rows of an RCP emissions array for consecutive years."""
+    i = (years - rcp_emis[0,0]).astype(int)
+    if len(i) > 0 and (i[0] < 0 or i[-1] >= len(rcp_emis)):
+        raise ValueError("RCP emissions are only available from %d to %d" %
+          (rcp_emis[0,0], rcp_emis[-1,0]))
+    return rcp_emis[i]
+
+
 def scen_open(filename,
               include_cfcs='rcp45',
               startyear=1765,
@@ -56,32 +98,12 @@ def scen_open(filename,
     http://wiki.magicc.org/index.php?title=Creating_MAGICC_Scenario_Files.
     """
 
-    with open(filename) as f:
-        # First line is the number of time steps in the SCEN file
-        str_nt = f.readline().strip()
-        nt = int(str_nt)
-
-        # Next 6 lines are unused by FaIR.
-        for i in range(6):
-            f.readline()
-
-        # Eighth line is the column headers. When object orientation is
-        # implemented this will be important.
-        headers = f.readline().split()
-
-        # Ninth line is the units. Again this will be important in OO-FaIR
-        units = f.readline().split()
-
-    # Now the data!
-    scen_emissions = np.genfromtxt(filename, skip_header=9, max_rows=nt)
-    emissions = np.copy(scen_emissions)
+    scen_emissions = _read_scen(filename)
     scen_years = scen_emissions[:,0]
 
     # Interpolate between non-consecutive years in SCEN file
-    f = interp1d(scen_years, emissions[:,1:], kind='linear', axis=0,
-        assume_sorted=True, bounds_error=True)
-    full_years = np.arange(scen_years[0], scen_years[-1]+1)
-    emissions_filled = np.hstack((full_years[:,None], f(full_years)))
+    emissions_filled = _fill_years(scen_emissions)
+    full_years = emissions_filled[:,0]
 
     # Add CFCs if requested
     if type(include_cfcs) is np.ndarray:
@@ -94,15 +116,11 @@ def scen_open(filename,
         pass
     elif include_cfcs.lower()[:3]=='rcp':
         rcp_emis = _import_emis_file(include_cfcs.lower()).emissions
-        # Need to ensure only years present in the SCEN file are taken
-        # Cheers: https://stackoverflow.com/questions/3522946/
-        # using-numpy-arrays-as-lookup-tables
         if int(scen_years[0])<1765:
             raise ValueError("CFCs can only be infilled from RCPs as far "+
             "back as 1765 at present")
-        rcp_years = np.arange(scen_years[0], scen_years[-1]+1)
-        mapping = dict(zip(rcp_emis[:,0], range(rcp_emis.shape[0])))
-        rcp_cfcs = np.array([rcp_emis[mapping[key],24:] for key in rcp_years])
+        # Need to ensure only years present in the SCEN file are taken
+        rcp_cfcs = _rcp_rows(rcp_emis, full_years)[:,24:]
         emissions_filled = np.append(emissions_filled, rcp_cfcs, axis=1)
     else:
         raise ValueError("include_cfcs should be an nt x 16 numpy array, a " +
@@ -118,13 +136,9 @@ def scen_open(filename,
         else:
             # tack RCP45 on to beginning
             rcp_emis = _import_emis_file('rcp45').emissions
-            rcp_years = np.arange(startyear, scen_years[0])
-            mapping = dict(zip(rcp_emis[:,0], range(rcp_emis.shape[0])))
-            if include_cfcs==False:
-                rcp_all = np.array([rcp_emis[mapping[key],:24] for key in rcp_years])
-            else:
-                rcp_all = np.array([rcp_emis[mapping[key],:] for key in rcp_years])
-            emissions_filled = np.insert(emissions_filled, 0, rcp_all, axis=0)
+            rcp_all = _rcp_rows(rcp_emis, np.arange(startyear, scen_years[0]))
+            emissions_filled = np.concatenate(
+              (rcp_all[:,:emissions_filled.shape[1]], emissions_filled))
 
         # harmonise?
         if harmonise is not None:
@@ -134,11 +148,50 @@ def scen_open(filename,
             elif harmonise > scen_years[-1]:
                  raise ValueError("Cannot harmonise after last year of "      +
                  "input dataset")
-            rcp_emis_2000 = rcp_emis[2000-startyear,:]
-            for j in range(1,emissions_filled.shape[1]):
-                f = interp1d((2000,harmonise), (rcp_emis_2000[j],
-                    emissions_filled[harmonise-startyear,j]))
-                emissions_filled[2000-startyear:harmonise-startyear,j] = f(
-                    np.arange(2000,harmonise))
+            ncol = emissions_filled.shape[1]
+            rcp_emis_2000 = _rcp_rows(rcp_emis, np.array([2000]))[0,1:ncol]
+            w = ((np.arange(2000, harmonise) - 2000) /
+              (harmonise - 2000))[:,None]
+            target = emissions_filled[harmonise-startyear,1:]
+            emissions_filled[2000-startyear:harmonise-startyear,1:] = (
+              rcp_emis_2000 + w * (target - rcp_emis_2000))
 
     return emissions_filled
+
+
+def _scen_open_task(args):
+    filename, kwargs = args
+    return scen_open(filename, **kwargs)
+
+
+def scen_open_many(filenames, workers=1, **kwargs):
+    """
+    Opens many MAGICC6 .SCEN files into one array.
+
+    Inputs:
+        filenames: sequence of .SCEN files to open
+
+    Keywords:
+        workers: number of processes to read files in
+        Other keywords are passed to scen_open and apply to every file.
+
+    Returns:
+        n_files x nt x 40 numpy emissions array
+
+    All files should cover the same years once filled, e.g. by giving the
+    same startyear and the same last year in every file.
+    """
+    tasks = [(filename, kwargs) for filename in filenames]
+    if len(tasks) == 0:
+        raise ValueError("filenames should contain at least one file")
+    if workers > 1 and len(tasks) > 1:
+        chunksize = max(1, int(np.ceil(len(tasks) / (4*workers))))
+        with multiprocessing.Pool(min(workers, len(tasks))) as pool:
+            results = pool.map(_scen_open_task, tasks, chunksize=chunksize)
+    else:
+        results = [_scen_open_task(task) for task in tasks]
+    shapes = set(result.shape for result in results)
+    if len(shapes) > 1:
+        raise ValueError("SCEN files cover different years; shapes of " +
+          "emissions arrays are %s" % sorted(shapes))
+    return np.stack(results)
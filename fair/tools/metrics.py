@@ -0,0 +1,214 @@
+from __future__ import division
+
+import numpy as np
+from functools import lru_cache
+from ..constants import molwt, radeff
+from ..constants.species import registry, lookup
+from ..constants.general import M_ATMOS
+from ..defaults import thermal
+from ..temperature.millar import calculate_q
+
+"""Vectorised emission metrics for all greenhouse gases in fair.constants.
+
+Metrics follow the analytical expressions of AR5 WG1 Ch8 SM, as in
+tools.gwp.gwp, with the FaIR default thermal response used for AGTP. Rows of
+the metrics table follow the species registry in fair.constants.species.
+"""
+
+# AR5 impulse response function for CO2
+_a_co2 = np.array([0.2173, 0.2240, 0.2824, 0.2763])
+_tau_co2 = np.array([np.inf, 394.4, 36.54, 4.304])
+
+# methane uses its perturbation lifetime; feedback factors as in tools.gwp
+_perturbation_lifetime = {'CH4': 12.4}
+_feedback = {'CH4': 0.65, 'N2O': -0.071874}
+
+species = list(registry['name'])
+
+
+def _default_q():
+    return calculate_q(thermal.tcrecs, thermal.d, thermal.f2x, thermal.tcr_dbl,
+      1)[0]
+
+
+def _conversion(wt):
+    """Radiative efficiency per ppb to per kg."""
+    return molwt.AIR/wt * 1e9/M_ATMOS
+
+
+def _decay_integral(H, tau):
+    """Integral of exp(-t/tau) from 0 to H, which is H for infinite tau."""
+    with np.errstate(invalid='ignore'):
+        return np.where(np.isinf(tau), H, tau * (1.0 - np.exp(-H/tau)))
+
+
+def _temperature_kernel(H, tau, q, d):
+    """Temperature at H from a unit forcing decaying with lifetime tau."""
+    H = np.asarray(H, dtype=float)[..., None]
+    tau = np.asarray(tau, dtype=float)[..., None]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        decaying = q*tau/(tau-d) * (np.exp(-H/tau) - np.exp(-H/d))
+    # limit of the above as tau approaches d
+    resonant = q * H/d * np.exp(-H/d)
+    constant = q * (1.0 - np.exp(-H/d))
+    return np.sum(np.where(np.isinf(tau), constant,
+      np.where(np.isclose(tau, d), resonant, decaying)), axis=-1)
+
+
+def agwp_co2(H, a=_a_co2, tau_co2=_tau_co2):
+    """Absolute global warming potential of CO2.
+
+    Inputs:
+        H: time horizon(s), years
+
+    Keywords:
+        a: impulse response partition for CO2
+        tau_co2: lifetimes for impulse response partition for CO2
+
+    Outputs:
+        AGWP, W m-2 yr kg-1, same shape as H
+    """
+    H = np.asarray(H, dtype=float)[..., None]
+    return radeff.CO2 * np.sum(a*_decay_integral(H, tau_co2), axis=-1) * (
+      _conversion(molwt.CO2))
+
+
+def agtp_co2(H, q=None, d=thermal.d, a=_a_co2, tau_co2=_tau_co2):
+    """Absolute global temperature change potential of CO2.
+
+    Inputs:
+        H: time horizon(s), years
+
+    Keywords:
+        q: coefficients of slow and fast temperature response, K/(W m-2).
+            Default is from the FaIR default TCR and ECS.
+        d: slow and fast thermal response timescales, years
+        a: impulse response partition for CO2
+        tau_co2: lifetimes for impulse response partition for CO2
+
+    Outputs:
+        AGTP, K kg-1, same shape as H
+    """
+    if q is None:
+        q = _default_q()
+    H = np.asarray(H, dtype=float)[..., None]
+    return radeff.CO2 * np.sum(a*_temperature_kernel(H, tau_co2, q, d),
+      axis=-1) * _conversion(molwt.CO2)
+
+
+def agwp(H, tau, re, wt, f=0.):
+    """Absolute global warming potential of a gas with a single lifetime.
+
+    All inputs broadcast against each other.
+
+    Inputs:
+        H: time horizon(s), years
+        tau: lifetime of gas, years
+        re: radiative efficiency of gas, W m-2 ppb-1
+        wt: molecular weight of gas, g mol-1
+
+    Keywords:
+        f: feedback factor
+
+    Outputs:
+        AGWP, W m-2 yr kg-1
+    """
+    return re * (1.0+f) * _decay_integral(H, tau) * _conversion(wt)
+
+
+def agtp(H, tau, re, wt, f=0., q=None, d=thermal.d):
+    """Absolute global temperature change potential of a gas with a single
+    lifetime.
+
+    All inputs broadcast against each other.
+
+    Inputs:
+        H: time horizon(s), years
+        tau: lifetime of gas, years
+        re: radiative efficiency of gas, W m-2 ppb-1
+        wt: molecular weight of gas, g mol-1
+
+    Keywords:
+        f: feedback factor
+        q: coefficients of slow and fast temperature response, K/(W m-2).
+            Default is from the FaIR default TCR and ECS.
+        d: slow and fast thermal response timescales, years
+
+    Outputs:
+        AGTP, K kg-1
+    """
+    if q is None:
+        q = _default_q()
+    return re * (1.0+f) * _temperature_kernel(H, tau, q, d) * _conversion(wt)
+
+
+@lru_cache(maxsize=32)
+def _table(horizons):
+    tau = registry['lifetime'].copy()
+    f = np.zeros(len(registry))
+    for name, value in _perturbation_lifetime.items():
+        tau[lookup(name)] = value
+    for name, value in _feedback.items():
+        f[lookup(name)] = value
+    re = registry['radeff']
+    wt = registry['molwt']
+    H = np.array(horizons, dtype=float)
+
+    out = {
+        'agwp': agwp(H, tau[:,None], re[:,None], wt[:,None], f[:,None]),
+        'agtp': agtp(H, tau[:,None], re[:,None], wt[:,None], f[:,None]),
+    }
+    # CO2 has no single lifetime; use its impulse response instead
+    out['agwp'][lookup('CO2')] = agwp_co2(H)
+    out['agtp'][lookup('CO2')] = agtp_co2(H)
+    out['gwp'] = out['agwp'] / agwp_co2(H)
+    out['gtp'] = out['agtp'] / agtp_co2(H)
+    for value in out.values():
+        value.setflags(write=False)
+    return out
+
+
+def table(horizons=(20, 100)):
+    """Emission metrics for every species in the constants modules.
+
+    Results are cached, so repeated calls with the same horizons are free.
+    Returned arrays are read-only.
+
+    Keywords:
+        horizons: time horizons, years
+
+    Outputs:
+        dict with keys 'agwp', 'agtp', 'gwp' and 'gtp', each an array of shape
+        (len(species), len(horizons)). Rows are in the order of the
+        species registry; use index() to look up a row.
+    """
+    return _table(tuple(np.atleast_1d(horizons).tolist()))
+
+
+def index(names):
+    """Row(s) of the metrics table for the given species name(s).
+
+    Names are case-insensitive and may use aliases such as CCL4.
+    """
+    return lookup(names)
+
+
+def co2_equivalent(emissions, names, metric='gwp', horizon=100):
+    """Convert emissions of any species to CO2-equivalent emissions.
+
+    Inputs:
+        emissions: emissions of each gas in mass units
+        names: species name(s) of each emission, broadcastable against
+            emissions
+
+    Keywords:
+        metric: 'gwp' or 'gtp'
+        horizon: time horizon, years
+
+    Outputs:
+        CO2-equivalent emissions in the same mass units as emissions
+    """
+    if metric not in ('gwp', 'gtp'):
+        raise ValueError("metric should be 'gwp' or 'gtp'")
+    factor = table(horizon)[metric][:,0]
+    return np.asarray(emissions) * factor[index(names)]
@@ -0,0 +1,571 @@
+from __future__ import division
+
+import os
+import inspect
+import weakref
+import multiprocessing
+import numpy as np
+from ..ancil import historical_scaling
+from ..defaults import thermal
+from ..forcing import aerosols, bc_snow, contrails, landuse
+from ..forward import fair_scm, default_timeseries
+from ..gas_cycle.fair1 import alpha_table
+from ..temperature.millar import calculate_q
+try:
+    from multiprocessing import shared_memory
+    has_shared_memory = True
+except ImportError:
+    has_shared_memory = False
+
+"""Parallel ensemble execution of fair_scm."""
+
+# arrays attached to shared memory in each worker process
+_worker = {}
+
+
+def _shared_empty(shape, dtype=float):
+    """Creates a shared memory block holding an array.
+
+    Returns the block, an array view of it and a picklable descriptor that
+    workers use to attach to it.
+    """
+    dtype = np.dtype(dtype)
+    nbytes = int(np.prod(shape)) * dtype.itemsize
+    shm = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+    view = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    return shm, view, (shm.name, shape, dtype.str)
+
+
+def _to_shared(array):
+    """Copies array into a new shared memory block.
+
+    Returns the block and its descriptor.
+    """
+    shm, view, descriptor = _shared_empty(array.shape, array.dtype)
+    view[...] = array
+    return shm, descriptor
+
+
+def _attach(descriptor):
+    name, shape, dtype = descriptor
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _member_inputs(scenario, params, s, p):
+    member = {key: value[s] for key, value in scenario.items()}
+    member.update({key: value[p] for key, value in params.items()})
+    return member
+
+
+def _worker_init(scenario, params, pairs, outputs, kwargs):
+    blocks = []
+    for name, descriptors in (('scenario', scenario), ('params', params)):
+        _worker[name] = {}
+        for key, descriptor in descriptors.items():
+            shm, _worker[name][key] = _attach(descriptor)
+            blocks.append(shm)
+    shm, _worker['pairs'] = _attach(pairs)
+    blocks.append(shm)
+    _worker['outputs'] = []
+    for descriptor in outputs:
+        shm, view = _attach(descriptor)
+        _worker['outputs'].append(view)
+        blocks.append(shm)
+    # keep the blocks open for the lifetime of the worker
+    _worker['blocks'] = blocks
+    _worker['kwargs'] = kwargs
+
+
+def _worker_run(members):
+    for i in range(*members):
+        s, p = _worker['pairs'][i]
+        result = fair_scm(**_member_inputs(_worker['scenario'],
+          _worker['params'], s, p), **_worker['kwargs'])
+        for out, value in zip(_worker['outputs'], result):
+            out[i] = value
+
+
+def _run_members(scenario, params, pairs, kwargs, workers, chunksize):
+    """Runs fair_scm for each (scenario, parameter set) index pair.
+
+    scenario and params are dicts of fair_scm keyword arguments whose first
+    axis is the scenario and parameter set respectively. Returns a list of
+    arrays with the member (pair) as first axis.
+    """
+    n = len(pairs)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers > 1 and not has_shared_memory:
+        raise ImportError('running fair_scm over more than one worker '+
+          'requires multiprocessing.shared_memory (Python 3.8 or later)')
+
+    # the first member is run here to find the output shapes
+    first = fair_scm(**_member_inputs(scenario, params, *pairs[0]), **kwargs)
+    for value in first:
+        if not isinstance(value, np.ndarray):
+            raise ValueError('only fair_scm options that return arrays are '+
+              'supported')
+
+    if workers == 1:
+        outputs = [np.zeros((n,) + value.shape) for value in first]
+        for out, value in zip(outputs, first):
+            out[0] = value
+        for i in range(1, n):
+            result = fair_scm(**_member_inputs(scenario, params, *pairs[i]),
+              **kwargs)
+            for out, value in zip(outputs, result):
+                out[i] = value
+        return outputs
+
+    inputs = []
+    descriptors = {'scenario': {}, 'params': {}}
+    for name, arrays in (('scenario', scenario), ('params', params)):
+        for key, value in arrays.items():
+            shm, descriptors[name][key] = _to_shared(value)
+            inputs.append(shm)
+    shm, pairs_descriptor = _to_shared(pairs)
+    inputs.append(shm)
+    outputs = []
+    output_descriptors = []
+    for value in first:
+        shm, view, descriptor = _shared_empty((n,) + value.shape)
+        view[0] = value
+        # the block is released once the returned array and all views of it
+        # are garbage collected
+        weakref.finalize(view, shm.close)
+        outputs.append((shm, view))
+        output_descriptors.append(descriptor)
+
+    if chunksize is None:
+        chunksize = max(1, int(np.ceil((n-1) / (4*workers))))
+    tasks = [(start, min(start+chunksize, n))
+      for start in range(1, n, chunksize)]
+
+    try:
+        with multiprocessing.Pool(workers, initializer=_worker_init,
+          initargs=(descriptors['scenario'], descriptors['params'],
+          pairs_descriptor, output_descriptors, kwargs)) as pool:
+            pool.map(_worker_run, tasks, chunksize=1)
+    finally:
+        for shm in inputs:
+            shm.close()
+            shm.unlink()
+        for shm, _ in outputs:
+            shm.unlink()
+
+    return [view for _, view in outputs]
+
+
+def _param_sizes(params):
+    params = {key: np.asarray(value) for key, value in params.items()}
+    sizes = set(len(value) for value in params.values())
+    return params, sizes
+
+
+def run_ensemble(emissions, params=None, workers=None, chunksize=None,
+    **kwargs):
+    """Runs an ensemble of fair_scm integrations over a process pool.
+
+    Emissions and parameter tables are placed in shared memory once rather
+    than being pickled into every task. Workers write their results directly
+    into shared output arrays, which are returned without copying.
+
+    Inputs:
+        emissions: emissions for fair_scm, either one scenario shared by all
+            members ((nt, 40), or (nt,) in CO2-only mode) or one scenario per
+            member ((n, nt, 40), or (n, nt) in CO2-only mode).
+
+    Keywords:
+        params: dict of fair_scm keyword arguments that vary across the
+            ensemble. Each value is an array whose first axis is the ensemble
+            member, e.g. {'tcrecs': (n, 2) array, 'r0': (n,) array}.
+        workers: number of worker processes. Default is the number of CPUs.
+            With workers=1 members are run in this process.
+        chunksize: number of members per task. Default splits the ensemble
+            into about four tasks per worker.
+        **kwargs: other keyword arguments to fair_scm, the same for every
+            member.
+
+    Returns:
+        tuple of arrays as returned by fair_scm (e.g. C, F, T), each with a
+        leading ensemble member axis.
+    """
+    params, sizes = _param_sizes({} if params is None else params)
+    emissions = np.asarray(emissions)
+    useMultigas = kwargs.get('useMultigas', True)
+    per_member = emissions.ndim == (3 if useMultigas else 2)
+    if per_member:
+        sizes.add(len(emissions))
+    if len(sizes) != 1:
+        raise ValueError('params and per-member emissions must all have the '+
+          'same number of ensemble members; got sizes ' + str(sorted(sizes)))
+    n = sizes.pop()
+
+    pairs = np.zeros((n, 2), dtype=int)
+    pairs[:,1] = np.arange(n)
+    if per_member:
+        pairs[:,0] = np.arange(n)
+    else:
+        emissions = emissions[None]
+    return tuple(_run_members({'emissions': emissions}, params, pairs,
+      kwargs, workers, chunksize))
+
+
+def run_batches(emissions, writer, params=None, batch_size=1000,
+    output_names=('C', 'F', 'T'), workers=None, chunksize=None, **kwargs):
+    """Runs an ensemble in batches, streaming each batch to a writer.
+
+    Batches are run as in run_ensemble and passed to writer.write as soon as
+    they finish. With a tools.writer.EnsembleWriter the batch is written in
+    a background thread while the next batch runs, and memory is bounded by
+    the batch size rather than the ensemble size.
+
+    Inputs:
+        emissions: emissions for fair_scm, as in run_ensemble
+        writer: object with a write(members, **outputs) method, e.g.
+            tools.writer.EnsembleWriter
+
+    Keywords:
+        params: dict of fair_scm keyword arguments that vary across the
+            ensemble, as in run_ensemble
+        batch_size: number of members per batch
+        output_names: names under which the outputs of fair_scm are written
+        workers: number of worker processes, as in run_ensemble
+        chunksize: number of members per task, as in run_ensemble
+        **kwargs: other keyword arguments to fair_scm, the same for every
+            member.
+
+    Returns:
+        number of members run
+    """
+    params, sizes = _param_sizes({} if params is None else params)
+    emissions = np.asarray(emissions)
+    useMultigas = kwargs.get('useMultigas', True)
+    per_member = emissions.ndim == (3 if useMultigas else 2)
+    if per_member:
+        sizes.add(len(emissions))
+    if len(sizes) != 1:
+        raise ValueError('params and per-member emissions must all have the '+
+          'same number of ensemble members; got sizes ' + str(sorted(sizes)))
+    n = sizes.pop()
+
+    for start in range(0, n, batch_size):
+        batch = slice(start, min(start+batch_size, n))
+        outputs = run_ensemble(emissions[batch] if per_member else emissions,
+          {key: value[batch] for key, value in params.items()},
+          workers=workers, chunksize=chunksize, **kwargs)
+        if len(outputs) != len(output_names):
+            raise ValueError('fair_scm returned ' + str(len(outputs)) +
+              ' outputs; give a name for each in output_names')
+        writer.write(np.arange(batch.start, batch.stop),
+          **dict(zip(output_names, outputs)))
+    return n
+
+# Forcings with no climate feedback, calculated from the emissions as in
+# fair_scm. Each takes the emissions of one scenario and a function returning
+# the value of a fair_scm keyword, and returns None if fair_scm would not
+# calculate the forcing from the emissions (e.g. it is already external).
+def _contrail_forcing(emissions, get):
+    option = get('contrail_forcing').lower()[0]
+    if option == 'n':
+        return contrails.from_aviNOx(emissions, get('aviNOx_frac'),
+          F_ref=get('F_ref_aviNOx'), E_ref=get('E_ref_aviNOx'))
+    if option == 'f':
+        return contrails.from_fuel(get('kerosene_supply'))
+
+
+def _aerosol_forcing(emissions, get):
+    option = get('aerosol_forcing').lower()
+    E_pi = get('E_pi')
+
+    def stevens():
+        return aerosols.Stevens(emissions, stevens_params=get(
+          'stevens_params'), E_pi=E_pi[5], ref_isSO2=get('ref_isSO2'))
+
+    if option == 'stevens':
+        ari, aci = stevens()
+        return ari + aci
+    if 'aerocom' in option:
+        ari = aerosols.aerocom_direct(emissions, beta=get('b_aero'),
+          E_pi=E_pi)
+        aci = 0.
+        if 'ghan2' in option:
+            aci = aerosols.ghan2(emissions, E_pi, get('ghan_params'))
+        elif 'ghan' in option:
+            aci = aerosols.ghan_indirect(emissions,
+              scale_AR5=get('scaleAerosolAR5'),
+              fix_pre1850_RCP=get('fixPre1850RCP'),
+              ghan_params=get('ghan_params'), E_pi=E_pi)
+        elif 'stevens' in option:
+            aci = stevens()[1]
+        return ari + aci
+
+
+def _bcsnow_forcing(emissions, get):
+    if get('bcsnow_forcing').lower()[:2] == 'em':
+        return bc_snow.linear(emissions - get('E_pi'), F_ref=get('F_ref_BC'),
+          E_ref=get('E_ref_BC'))
+
+
+def _landuse_forcing(emissions, get):
+    if get('landuse_forcing').lower()[0] == 'c':
+        restart_in = get('restart_in')
+        return landuse.cumulative(emissions - get('E_pi'),
+          aCO2land=get('aCO2land'), dt=get('timestep'),
+          E0=restart_in[8] if restart_in else 0.)
+
+
+# For each forcing: the fair_scm switch that selects an external time series,
+# the keyword holding that series, the function calculating it, and the
+# keywords the forcing depends on.
+_external_forcings = (
+    ('contrail_forcing', 'F_contrails', _contrail_forcing,
+      ('contrail_forcing', 'aviNOx_frac', 'F_ref_aviNOx', 'E_ref_aviNOx',
+      'kerosene_supply', 'F_contrails')),
+    ('aerosol_forcing', 'F_aerosol', _aerosol_forcing,
+      ('aerosol_forcing', 'b_aero', 'ghan_params', 'stevens_params',
+      'ref_isSO2', 'E_pi', 'scaleAerosolAR5', 'fixPre1850RCP',
+      'F_aerosol')),
+    ('bcsnow_forcing', 'F_bcsnow', _bcsnow_forcing,
+      ('bcsnow_forcing', 'F_ref_BC', 'E_ref_BC', 'E_pi', 'F_bcsnow')),
+    ('landuse_forcing', 'F_landuse', _landuse_forcing,
+      ('landuse_forcing', 'aCO2land', 'E_pi', 'F_landuse', 'timestep',
+      'restart_in')),
+)
+
+_thermal_keys = ('tcrecs', 'd', 'F2x', 'tcr_dbl')
+_carbon_box_keys = ('a', 'tau', 'iirf_h')
+
+
+def run_product(scenarios, params=None, workers=None, chunksize=None,
+    **kwargs):
+    """Runs every scenario against every parameter set.
+
+    Work that depends only on the parameters or only on the scenario is done
+    once rather than for every combination:
+        - the temperature response coefficients q are calculated once per
+          parameter set from TCR and ECS (Millar temperature function);
+        - contrail, aerosol, black carbon on snow and land use forcing, which
+          have no climate feedback, are calculated once per scenario directly
+          from the forcing modules and passed to fair_scm as external
+          forcing, unless any parameter they depend on varies across
+          parameter sets;
+        - the CO2 time constant scale factor (alpha) depends on the model
+          state only through the time-integrated airborne fraction, so it is
+          tabulated once per set of carbon cycle box parameters (a, tau,
+          iirf_h) with gas_cycle.fair1.alpha_table and interpolated in every
+          run instead of being solved for. This agrees with the solved value
+          to within about 1e-6 relative.
+    Members are run as in run_ensemble.
+
+    Inputs:
+        scenarios: (n_scen, nt, 40) array of multi-gas emissions scenarios,
+            or (n_scen, nt) array in CO2-only mode
+
+    Keywords:
+        params: dict of fair_scm keyword arguments that vary across parameter
+            sets. Each value is an array whose first axis is the parameter set.
+        workers: number of worker processes. Default is the number of CPUs.
+        chunksize: number of members per task.
+        **kwargs: other keyword arguments to fair_scm, the same for every run.
+
+    Returns:
+        tuple of arrays as returned by fair_scm (e.g. C, F, T), each with
+        leading (n_scen, n_param) axes.
+    """
+    params, sizes = _param_sizes({} if params is None else params)
+    scenarios = np.asarray(scenarios)
+    useMultigas = kwargs.get('useMultigas', True)
+    if scenarios.ndim != (3 if useMultigas else 2):
+        raise ValueError('scenarios should be a (n_scen, nt, 40) array, or '+
+          '(n_scen, nt) in CO2-only mode')
+    if len(sizes) > 1:
+        raise ValueError('params must all have the same number of parameter '+
+          'sets; got sizes ' + str(sorted(sizes)))
+    n_scen = len(scenarios)
+    n_param = sizes.pop() if sizes else 1
+    nt = scenarios.shape[1]
+    kwargs = dict(kwargs)
+    scenario = {'emissions': scenarios}
+
+    def get(key, p=None):
+        """Value of a fair_scm keyword, for parameter set p if it varies."""
+        if p is not None and key in params:
+            return params[key][p]
+        value = kwargs.get(key, _signature[key].default)
+        return np.asarray(value) if type(value) is list else value
+
+    # scenario-only: forcing with no climate feedback
+    if useMultigas and kwargs.get('diagnostics') != 'AR6':
+        shared = [forcing for forcing in _external_forcings
+          if not any(key in params for key in forcing[3])]
+        if kwargs.get('ariaci_out'):
+            # keep the aerosol components
+            shared = [forcing for forcing in shared
+              if forcing[0] != 'aerosol_forcing']
+        for switch, key, forcing, _ in shared:
+            F = [forcing(emissions, get) for emissions in scenarios]
+            if F[0] is None:
+                continue
+            kwargs[switch] = 'external'
+            kwargs.pop(key, None)
+            scenario[key] = np.array([np.broadcast_to(value, nt)
+              for value in F], dtype=float)
+
+    # parameter-only: CO2 time constant scale factor table
+    if (not kwargs.get('gir_carbon_cycle') and 'alpha_table' not in kwargs
+      and 'alpha_table' not in params):
+        if any(key in params for key in _carbon_box_keys):
+            params['alpha_table'] = np.array([alpha_table(*[get(key, p)
+              for key in _carbon_box_keys]) for p in range(n_param)])
+        else:
+            kwargs['alpha_table'] = alpha_table(*[get(key) for key in
+              _carbon_box_keys])
+
+    # parameter-only: temperature response coefficients
+    defaults = {'tcrecs': thermal.tcrecs, 'd': thermal.d, 'F2x': thermal.f2x,
+      'tcr_dbl': thermal.tcr_dbl}
+    if (kwargs.get('temperature_function', 'Millar')=='Millar' and
+      type(params.get('tcrecs', kwargs.get('tcrecs', thermal.tcrecs))) is
+      np.ndarray):
+        def _thermal(key, p):
+            if key in params:
+                return params[key][p]
+            return kwargs.get(key, defaults[key])
+        q = [calculate_q(*[_thermal(key, p) for key in _thermal_keys], nt)
+          for p in range(n_param if any(key in params for key in
+          _thermal_keys) else 1)]
+        if len(q) > 1:
+            params['q'] = np.array(q)
+        else:
+            kwargs['q'] = q[0]
+        params.pop('tcrecs', None)
+        kwargs['tcrecs'] = None
+
+    pairs = np.column_stack((np.repeat(np.arange(n_scen), n_param),
+      np.tile(np.arange(n_param), n_scen)))
+    outputs = _run_members(scenario, params, pairs, kwargs, workers,
+      chunksize)
+    return tuple(out.reshape((n_scen, n_param) + out.shape[1:])
+      for out in outputs)
+
+
+# time series keywords of fair_scm, split at the end of the historical period
+# by run_constrained along with the emissions
+_timeseries = ('natural', 'F_volcanic', 'F_solar', 'F_contrails', 'F_bcsnow',
+  'F_landuse', 'F_aerosol', 'F_tropO3', 'kerosene_supply', 'fossilCH4_frac',
+  'scale', 'other_rf', 'tcrecs', 'q')
+
+_signature = inspect.signature(fair_scm).parameters
+
+
+def _split_timeseries(kwargs, n_hist, nt):
+    """Splits fair_scm keyword arguments into historical and future runs."""
+    kwargs = dict(kwargs)
+    if kwargs.pop('scaleHistoricalAR5', False):
+        # the scaling is by year from the start of the run, so apply it here
+        useMultigas = kwargs.get('useMultigas', True)
+        nF = 41 if kwargs.get('diagnostics')=='AR6' else 13
+        scale = kwargs.get('scale')
+        if scale is None:
+            scale = np.ones((nt, nF)) if useMultigas else np.ones(nt)
+        kwargs['scale'] = scale * (historical_scaling.all[:nt,:] if
+          useMultigas else historical_scaling.co2[:nt])
+    hist = dict(kwargs)
+    future = dict(kwargs)
+    for key in _timeseries:
+        value = kwargs.get(key, _signature[key].default)
+        if value is None and key in default_timeseries:
+            value = default_timeseries[key]()
+        if (isinstance(value, np.ndarray) and value.ndim >= 1 and
+          len(value) == nt and (value.ndim == 2 or key not in
+          ('natural', 'tcrecs', 'q'))):
+            hist[key] = value[:n_hist]
+            future[key] = value[n_hist:]
+    return hist, future
+
+
+def run_constrained(scenarios, n_hist, constraint, params=None,
+    batch_size=1000, **kwargs):
+    """Runs an ensemble over the historical period, constrains it and
+    continues only the accepted members into the future scenarios.
+
+    Members are processed in batches. Each batch is first run over the
+    historical period only. The constraint is applied to the historical
+    temperatures and the accepted members are restarted from their state at
+    the end of the historical period in each scenario, so no time is spent
+    integrating the future of rejected members. This is a generator: only
+    one batch is held in memory at a time.
+
+    Inputs:
+        scenarios: (n_scen, nt, 40) array of multi-gas emissions scenarios,
+            or (n_scen, nt) array in CO2-only mode. All scenarios must be
+            identical over the historical period.
+        n_hist: number of timesteps in the historical period
+        constraint: function taking an (n_batch, n_hist) array of historical
+            temperatures and returning a boolean array of accepted members,
+            e.g. lambda T: tools.constrain.HistTemp(Tobs, years).accept(
+            T[:,85:252])[0]
+
+    Keywords:
+        params: dict of fair_scm keyword arguments that vary across the
+            ensemble. Each value is an array whose first axis is the ensemble
+            member, as in run_ensemble.
+        batch_size: number of members to run and constrain at a time
+        **kwargs: other keyword arguments to fair_scm, the same for every
+            member. Time series arguments (e.g. F_volcanic) cover the whole
+            period of the scenarios and are split at n_hist.
+
+    Yields:
+        members: indices of the accepted members of the batch
+        outputs: tuple of arrays as returned by fair_scm (C, F, T), each with
+            leading (n_scen, len(members)) axes and covering the historical
+            and future periods.
+    """
+    params, sizes = _param_sizes({} if params is None else params)
+    if len(sizes) != 1:
+        raise ValueError('params must all have the same number of ensemble '+
+          'members; got sizes ' + str(sorted(sizes)))
+    n = sizes.pop()
+    scenarios = np.asarray(scenarios)
+    useMultigas = kwargs.get('useMultigas', True)
+    if scenarios.ndim != (3 if useMultigas else 2):
+        raise ValueError('scenarios should be a (n_scen, nt, 40) array, or '+
+          '(n_scen, nt) in CO2-only mode')
+    nt = scenarios.shape[1]
+    if not 0 < n_hist < nt:
+        raise ValueError('n_hist should be between 1 and ' + str(nt-1))
+    if np.any(scenarios[:,:n_hist] != scenarios[:1,:n_hist]):
+        raise ValueError('scenarios differ over the historical period')
+    for key in ('restart_in', 'restart_out'):
+        if key in kwargs or key in params:
+            raise ValueError(key + ' is set by run_constrained')
+    history = scenarios[0,:n_hist]
+    future = scenarios[:,n_hist:]
+
+    for start in range(0, n, batch_size):
+        batch = np.arange(start, min(start+batch_size, n))
+        runs = []
+        for i in batch:
+            member = dict(kwargs)
+            member.update({key: value[i] for key, value in params.items()})
+            hist_kwargs, future_kwargs = _split_timeseries(member, n_hist, nt)
+            result = fair_scm(emissions=history, restart_out=True,
+              **hist_kwargs)
+            runs.append((result, future_kwargs))
+        accept = np.asarray(constraint(np.array([result[2]
+          for result, _ in runs])), dtype=bool)
+
+        members = batch[accept]
+        outputs = [np.zeros((len(future), len(members), nt) + value.shape[1:])
+          for value in runs[0][0][:-1]]
+        for j, (result, future_kwargs) in enumerate(
+          [run for run, ok in zip(runs, accept) if ok]):
+            for s, emissions in enumerate(future):
+                continued = fair_scm(emissions=emissions,
+                  restart_in=result[-1], **future_kwargs)
+                for out, past, value in zip(outputs, result, continued):
+                    out[s,j,:n_hist] = past
+                    out[s,j,n_hist:] = value
+        yield members, tuple(outputs)
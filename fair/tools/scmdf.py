@@ -5,32 +5,36 @@ import datetime as dt
 import os
 import numpy as np
 import pandas as pd
+from functools import lru_cache
 from scipy.interpolate import interp1d
 
 from ..constants import molwt
+from .._cache import cached
 
 try:
     from scmdata import ScmDataFrame, ScmRun
+    from scmdata.units import UnitConverter
     has_scmdata = True
 except ImportError:
     has_scmdata = False
 
 
+_ssp_filename = os.path.join(
+    os.path.dirname(__file__),
+    '../SSPs/data/rcmip-emissions-annual-means-4-0-0-ssp-only.csv')
+
+
 class SSP245WorldEmms:
     def __init__(self):
         self._loaded = False
         self._loaded_fair_history = False
+        self._loaded_fair_array = False
 
     @property
     def values(self):
         if not self._loaded:
             self._values = (
-                ScmRun(
-                    os.path.join(
-                        os.path.dirname(__file__),
-                        '../SSPs/data/rcmip-emissions-annual-means-4-0-0-ssp-only.csv'),
-                        lowercase_cols=True
-                )
+                ScmRun(_ssp_filename, lowercase_cols=True)
                 .filter(scenario="ssp245", region="World", variable="Emissions*")
             )
             self._values = self._values.interpolate([dt.datetime(y, 1, 1) for y in self._values["year"]])
@@ -77,9 +81,41 @@ class SSP245WorldEmms:
 
         return self._values_fair_history
 
+    @property
+    def fair_array(self):
+        """
+        SSP2-4.5 World emissions in FaIR units as a plain nt x 40 array.
+
+        The first column is the year and the others follow the order and
+        units of ``EMISSIONS_SPECIES_UNITS_CONTEXT``. The array is built from
+        ``values_fair_units`` once and then kept in the dataset cache, keyed
+        on the contents of the RCMIP file, so later processes load it without
+        reading the CSV or converting units. It is read-only.
+        """
+        if not self._loaded_fair_array:
+            self._fair_array = cached(_ssp_filename, self._build_fair_array,
+                                      tag="ssp245-world-fair-units")
+            self._fair_array.setflags(write=False)
+
+        self._loaded_fair_array = True
+
+        return self._fair_array
+
+    def _build_fair_array(self):
+        if not has_scmdata:
+            raise ImportError("scmdata is required to convert the SSP245 history")
+
+        history = self.values_fair_units.timeseries()
+        variables = history.index.get_level_values("variable")
+
+        data = np.ones((history.shape[1], 40)) * np.nan
+        data[:, 0] = [time.year for time in history.columns]
+        for i, species in enumerate(EMISSIONS_SPECIES_UNITS_CONTEXT["species"]):
+            data[:, i + 1] = history[variables.str.endswith(species)].values.squeeze()
+
+        return data
 
 
-# TODO: lazy load this and only load once
 ssp245_world_emms_holder = SSP245WorldEmms()
 
 
@@ -142,6 +178,199 @@ def _get_fair_col_unit_context(variable):
     return fair_col, in_unit, context
 
 
+_fair_columns = {}
+
+
+def _fair_column(variable):
+    """FaIR emissions column of a variable, or None if FaIR does not model it."""
+    if variable not in _fair_columns:
+        try:
+            _fair_columns[variable] = _get_fair_col_unit_context(variable)
+        except AssertionError:
+            _fair_columns[variable] = None
+    return _fair_columns[variable]
+
+
+# Mass prefixes of emissions units, in kt
+_MASS_PREFIXES = {"t": 1e-3, "kt": 1.0, "Mt": 1e3, "Gt": 1e6}
+
+# Other substances that emissions of a species are commonly reported as,
+# with the mass of the FaIR substance per mass of each. Values match the
+# openscm-units definitions behind scmdata's convert_unit, so results agree
+# with it: NOx is taken as NO2 (the NOx_conversions context), and N2O is
+# converted to N with one nitrogen atom per molecule (14/44).
+_SPECIES_SUBSTANCES = {
+    "|CO2|MAGICC Fossil and Industrial": {"CO2": 12 / 44},
+    "|CO2|MAGICC AFOLU": {"CO2": 12 / 44},
+    "|N2O": {"N2O": 14 / 44},
+    "|Sulfur": {"SO2": 32 / 64},
+    "|VOC": {"VOC": 1.0},
+    "|NOx": {"NOx": 14 / 46, "NO2": 14 / 46},
+    "|NH3": {"NH3": 14 / 17},
+}
+
+
+def _split_unit(unit):
+    """Splits an emissions unit such as 'Mt CO2 / yr' into ('Mt', 'CO2')."""
+    unit = unit.replace(" ", "")
+    if not unit.endswith("/yr"):
+        return None
+    for prefix in ("kt", "Mt", "Gt", "t"):
+        if unit.startswith(prefix):
+            return prefix, unit[len(prefix):-len("/yr")]
+    return None
+
+
+def _unit_factor_table():
+    """
+    Conversion factors from common input units to the FaIR unit of each
+    species, keyed on (FaIR column, input unit without spaces).
+    """
+    table = {}
+    species_units = zip(
+        EMISSIONS_SPECIES_UNITS_CONTEXT["species"], EMISSIONS_SPECIES_UNITS_CONTEXT["in_unit"]
+    )
+    for i, (species, fair_unit) in enumerate(species_units):
+        fair_prefix, fair_substance = _split_unit(fair_unit)
+        substances = dict(_SPECIES_SUBSTANCES.get(species, {}))
+        substances[fair_substance] = 1.0
+        for prefix, mass in _MASS_PREFIXES.items():
+            for substance, factor in substances.items():
+                table[i + 1, prefix + substance + "/yr"] = (
+                    mass / _MASS_PREFIXES[fair_prefix] * factor
+                )
+    return table
+
+
+UNIT_FACTORS = _unit_factor_table()
+
+
+@lru_cache(maxsize=None)
+def _pint_unit_factor(in_unit, fair_unit, context):
+    return float(UnitConverter(in_unit, fair_unit, context=context).convert_from(1.0))
+
+
+def _unit_factor(in_unit, fair_col, fair_unit, context):
+    """
+    Factor converting emissions of a FaIR column in in_unit to fair_unit,
+    from UNIT_FACTORS, or from pint for units not in the table.
+    """
+    factor = UNIT_FACTORS.get((fair_col, in_unit.replace(" ", "")))
+    if factor is None:
+        factor = _pint_unit_factor(in_unit, fair_unit, context)
+    return factor
+
+
+def _interpolate_rows(values, times, target_times):
+    """
+    Linearly interpolates (and extrapolates) each row of values to
+    target_times, ignoring missing values, as ``ScmRun.interpolate`` does.
+    """
+    out = np.empty((values.shape[0], len(target_times)))
+    valid = ~np.isnan(values)
+    # rows sharing the same missing values are interpolated together
+    patterns, inverse = np.unique(valid, axis=0, return_inverse=True)
+    for k, pattern in enumerate(patterns):
+        rows = inverse == k
+        x = times[pattern]
+        y = values[rows][:, pattern]
+        if len(x) < 2:
+            raise ValueError("Each timeseries needs at least two values to interpolate")
+        i = np.clip(np.searchsorted(x, target_times, side="right") - 1, 0, len(x) - 2)
+        w = (target_times - x[i]) / (x[i + 1] - x[i])
+        out[rows] = y[:, i] + w * (y[:, i + 1] - y[:, i])
+    return out
+
+
+def scmrun_to_emissions(scmrun, startyear=1765, endyear=2100):
+    """
+    Converts every scenario in an ScmRun to FaIR emissions in one go.
+
+    Scenarios are interpolated linearly to annual values from 2015 and
+    converted to FaIR units. History before 2015, and any species missing
+    from a scenario, are filled from SSP2-4.5 as in ``scmdf_to_emissions``.
+    The variable to column map and unit conversion factors are worked out
+    once for each distinct variable and unit, then all scenarios are filled
+    with array operations.
+
+    Inputs:
+        scmrun: ScmRun or ScmDataFrame holding any number of scenarios
+
+    Keywords:
+        startyear: First year of output.
+        endyear: Last year of output.
+
+    Returns:
+        emissions: n_scen x nt x 40 numpy emissions array
+        index: pandas.DataFrame of the metadata (e.g. model, scenario and
+            region) identifying each scenario, in the order of emissions
+    """
+    if not has_scmdata:
+        raise ImportError("This is not going to work without having scmdata installed")
+
+    if not isinstance(scmrun, (ScmRun, ScmDataFrame)):
+        raise TypeError("scmrun must be an scmdata.ScmRun or scmdata.ScmDataFrame instance")
+
+    n_cols = 40
+    nt = endyear - startyear + 1
+
+    timeseries = scmrun.timeseries()
+    meta = timeseries.index.to_frame(index=False)
+    scenario_cols = [c for c in meta.columns if c not in ("variable", "unit")]
+
+    # SSP245 fills the history and any species missing from the scenarios
+    ssp245 = ssp245_world_emms_holder.fair_array
+    first_row = int(startyear - ssp245[0, 0])
+    if first_row < 0 or endyear > ssp245[-1, 0]:
+        raise ValueError(
+            "startyear and endyear should be within {} to {}".format(
+                int(ssp245[0, 0]), int(ssp245[-1, 0])
+            )
+        )
+
+    variables = meta["variable"].values
+    unknown = sorted(set(v for v in set(variables) if _fair_column(v) is None))
+    if unknown:
+        raise ValueError("FaIR does not model {}".format(unknown))
+
+    fair_col = np.array([_fair_column(v)[0] for v in variables])
+    factor = np.array([
+        _unit_factor(unit, *_fair_column(variable))
+        for variable, unit in zip(variables, meta["unit"].values)
+    ])
+
+    # number the scenarios in order of appearance; factorize gives every
+    # missing value the same code, so metadata holding NaN is kept together
+    codes = np.column_stack(
+        [pd.factorize(meta[col].values)[0] for col in scenario_cols]
+    ).reshape((len(meta), len(scenario_cols)))
+    _, first, inverse = np.unique(codes, axis=0, return_index=True, return_inverse=True)
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    scenario_id = rank[inverse.ravel()]
+    index = meta[scenario_cols].iloc[first[order]].reset_index(drop=True)
+    if len(set(zip(scenario_id, fair_col))) != len(fair_col):
+        raise ValueError("Each scenario should have one timeseries per species")
+
+    scen_start_year = max(2015, startyear)
+    scen_years = np.arange(scen_start_year, endyear + 1)
+    first_scen_row = scen_start_year - startyear
+
+    seconds = np.array(pd.to_datetime(timeseries.columns).values, dtype="datetime64[s]").astype(float)
+    target_seconds = np.array(
+        [dt.datetime(y, 1, 1) for y in scen_years], dtype="datetime64[s]"
+    ).astype(float)
+    values = _interpolate_rows(timeseries.values.astype(float), seconds, target_seconds)
+
+    emissions = np.repeat(ssp245[None, first_row : first_row + nt, :n_cols], len(index), axis=0)
+    emissions[scenario_id[:, None], np.arange(first_scen_row, nt)[None, :], fair_col[:, None]] = (
+        values * factor[:, None]
+    )
+
+    return emissions, index
+
+
 def scmdf_to_emissions(scmdf, include_cfcs=True, startyear=1765, endyear=2100):
     """
     Opens an ScmDataFrame and extracts the data. Interpolates linearly
@@ -173,12 +402,6 @@ def scmdf_to_emissions(scmdf, include_cfcs=True, startyear=1765, endyear=2100):
     # historical.
     # This adapter will not be tested on anything else!
 
-    n_cols = 40
-    nt = endyear - startyear + 1
-
-    data_out = np.ones((nt, n_cols)) * np.nan
-    data_out[:,0] = np.arange(startyear, endyear+1)
-
     if not has_scmdata:
         raise ImportError("This is not going to work without having scmdata installed")
 
@@ -191,48 +414,171 @@ def scmdf_to_emissions(scmdf, include_cfcs=True, startyear=1765, endyear=2100):
     if scmdf[["model", "scenario"]].drop_duplicates().shape[0] != 1:
         raise AssertionError("Should only have one model-scenario pair")
 
-    scen_start_year = 2015
+    return scmrun_to_emissions(scmdf, startyear=startyear, endyear=endyear)[0][0]
 
-    scmdf = ScmRun(scmdf.timeseries()).interpolate(
-        [dt.datetime(y, 1, 1) for y in range(scen_start_year, endyear + 1)]
-    )
 
-    years = scmdf["year"].values
-    first_scenyear = years[0]
-    first_scen_row = int(first_scenyear-startyear)
+_CONCENTRATION_SPECIES = (
+    ["|CO2"] + list(EMISSIONS_SPECIES_UNITS_CONTEXT["species"].iloc[[2, 3]])
+    + list(EMISSIONS_SPECIES_UNITS_CONTEXT["species"].iloc[11:])
+)
+
+_FORCING_AGENTS = (
+    "|Anthropogenic|Tropospheric Ozone",
+    "|Anthropogenic|Stratospheric Ozone",
+    "|Anthropogenic|CH4 Oxidation Stratospheric H2O",
+    "|Anthropogenic|Contrails",
+)
 
-    # if correct units and interpolation were guaranteed we could do this for scenario too which is quicker
-    hist_df = ssp245_world_emms_holder.values_fair_units.filter(
-        year=range(startyear, 2015)
-    ).timeseries()
+_FORCING_AGENTS_END = (
+    "|Anthropogenic|BC on Snow",
+    "|Anthropogenic|Albedo Change",
+    "|Natural|Volcanic",
+    "|Natural|Solar",
+)
 
-    future_ssp245_df = ssp245_world_emms_holder.values_fair_units.filter(
-        year=range(2015, endyear + 1)
-    ).timeseries()
 
-    for species in EMISSIONS_SPECIES_UNITS_CONTEXT["species"]:
-        fair_col, _, _ = _get_fair_col_unit_context(species)
+def _output_variables(name, n_var):
+    """Variable names and units of the columns of a fair_scm output."""
+    if name == "C":
+        if n_var == 1:
+            return ["Atmospheric Concentrations|CO2"], ["ppm"]
+        if n_var != len(_CONCENTRATION_SPECIES):
+            raise ValueError("C should have 31 gases, got {}".format(n_var))
+        variables = ["Atmospheric Concentrations" + s for s in _CONCENTRATION_SPECIES]
+        return variables, ["ppm", "ppb", "ppb"] + ["ppt"] * (n_var - 3)
+    if name == "F":
+        anthropogenic = ["|Anthropogenic" + s for s in _CONCENTRATION_SPECIES[:3]]
+        if n_var == 1:
+            agents = [""]
+        elif n_var == 13:
+            agents = (
+                anthropogenic + ["|Anthropogenic|Other WMGHGs"] + list(_FORCING_AGENTS)
+                + ["|Anthropogenic|Aerosols"] + list(_FORCING_AGENTS_END)
+            )
+        elif n_var == 41:
+            agents = (
+                anthropogenic
+                + ["|Anthropogenic" + s for s in _CONCENTRATION_SPECIES[3:]]
+                + list(_FORCING_AGENTS)
+                + [
+                    "|Anthropogenic|Aerosols|Aerosols-radiation Interactions",
+                    "|Anthropogenic|Aerosols|Aerosols-cloud Interactions",
+                ]
+                + list(_FORCING_AGENTS_END)
+            )
+        else:
+            raise ValueError("F should have 13 or 41 forcing agents, got {}".format(n_var))
+        return ["Effective Radiative Forcing" + a for a in agents], ["W/m^2"] * n_var
+    if name == "T":
+        return ["Surface Air Temperature Change"], ["K"]
+    raise ValueError("output name should be C, F or T, got {}".format(name))
 
-        hist_df_row = hist_df.index.get_level_values("variable").str.endswith(species)
 
-        data_out[: first_scen_row, fair_col] = hist_df[hist_df_row].values.squeeze()
+def _output_timeseries(outputs, meta):
+    """
+    Stacks fair_scm outputs into one (n_series, nt) array of timeseries with
+    a metadata column for each series.
+    """
+    if not outputs:
+        raise ValueError("give at least one of C, F and T")
+    n = len(next(iter(outputs.values())))
+
+    meta_out = {
+        "climate_model": "FaIR",
+        "model": "unspecified",
+        "scenario": "unspecified",
+        "region": "World",
+        "ensemble_member": np.arange(n),
+    }
+    meta_out.update(meta)
+
+    blocks = []
+    variables = []
+    units = []
+    members = []
+    for name, value in outputs.items():
+        value = np.asarray(value)
+        if len(value) != n:
+            raise ValueError("outputs should have the same number of members")
+        if value.ndim == 2:
+            value = value[:, :, None]
+        names, var_units = _output_variables(name, value.shape[2])
+        # one bulk reshape to (member, variable) rows of timeseries
+        blocks.append(value.transpose(0, 2, 1).reshape((-1, value.shape[1])))
+        variables.append(np.tile(names, n))
+        units.append(np.tile(var_units, n))
+        members.append(np.repeat(np.arange(n), len(names)))
+
+    values = np.concatenate(blocks)
+    members = np.concatenate(members)
+    columns = {}
+    for key, value in meta_out.items():
+        value = np.asarray(value)
+        if value.ndim == 0:
+            columns[key] = np.repeat(value, len(members))
+        elif len(value) == n:
+            columns[key] = value[members]
+        else:
+            raise ValueError(
+                "meta {} should be a single value or one per member".format(key)
+            )
+    columns["variable"] = np.concatenate(variables)
+    columns["unit"] = np.concatenate(units)
+    return values, columns
 
-        future_ssp245_df_row = future_ssp245_df.index.get_level_values("variable").str.endswith(species)
 
-        data_out[first_scen_row :, fair_col] = future_ssp245_df[future_ssp245_df_row].values.squeeze()
+def output_to_dataframe(years, C=None, F=None, T=None, meta=None):
+    """
+    Converts batched fair_scm outputs to a long-format pandas DataFrame.
 
+    Inputs:
+        years: (nt,) array of the years of the outputs
 
-    for var_df in scmdf.groupby("variable"):
-        variable = var_df.get_unique_meta("variable", no_duplicates=True)
-        in_unit = var_df.get_unique_meta("unit", no_duplicates=True)
-        fair_col, fair_unit, context = _get_fair_col_unit_context(variable)
+    Keywords:
+        C: n_members x nt x 31 concentrations (n_members x nt in CO2-only mode)
+        F: n_members x nt x 13 forcing, n_members x nt x 41 with AR6
+            diagnostics (n_members x nt in CO2-only mode)
+        T: n_members x nt temperature change
+        meta: dict of metadata, each a single value or one value per member,
+            e.g. {"scenario": "ssp245", "tcr": tcr}. Defaults are
+            climate_model "FaIR", model and scenario "unspecified", region
+            "World" and ensemble_member numbering the members.
 
-        if in_unit != fair_unit:
-            var_df_fair_unit = var_df.convert_unit(fair_unit, context=context)
-        else:
-            var_df_fair_unit = var_df
+    Returns:
+        pandas.DataFrame with a row per member, variable and year, columns for
+        each metadata key, "variable", "unit", "year" and "value"
+    """
+    outputs = {k: v for k, v in (("C", C), ("F", F), ("T", T)) if v is not None}
+    values, columns = _output_timeseries(outputs, {} if meta is None else meta)
+    nt = values.shape[1]
+    if len(years) != nt:
+        raise ValueError("years should have {} values".format(nt))
+    data = {key: np.repeat(value, nt) for key, value in columns.items()}
+    data["year"] = np.tile(years, len(values))
+    data["value"] = values.ravel()
+    return pd.DataFrame(data)
+
+
+def output_to_scmrun(years, C=None, F=None, T=None, meta=None):
+    """
+    Converts batched fair_scm outputs to one ScmRun.
 
-        data_out[first_scen_row :, fair_col] = var_df_fair_unit.values.squeeze()
+    Takes the same arguments as ``output_to_dataframe``. Variable names and
+    units follow the emissions species order of
+    ``EMISSIONS_SPECIES_UNITS_CONTEXT`` and the forcing layout of fair_scm.
 
+    Returns:
+        scmdata.ScmRun with a timeseries per member and variable
+    """
+    if not has_scmdata:
+        raise ImportError("This is not going to work without having scmdata installed")
 
-    return data_out
+    outputs = {k: v for k, v in (("C", C), ("F", F), ("T", T)) if v is not None}
+    values, columns = _output_timeseries(outputs, {} if meta is None else meta)
+    if len(years) != values.shape[1]:
+        raise ValueError("years should have {} values".format(values.shape[1]))
+    return ScmRun(
+        values.T,
+        index=np.asarray(years),
+        columns={key: list(value) for key, value in columns.items()},
+    )
@@ -1,58 +1,57 @@
 from __future__ import division
 
 import numpy as np
-from itertools import compress
+from scipy.optimize import root
+from ..ancil import natural as natural_builtin
 from ..constants.general import M_ATMOS
-from ..constants import molwt as molwt_builtin, preindconc,\
-   lifetime as lt_builtin
+from ..constants import molwt as molwt_builtin
+from ..constants.species import registry, lookup, nmodel
+from ..defaults import carbon, thermal
+from ..forcing import ozone_st, h2o_st
+from ..forcing.ghg import minor_gases
+from ..gas_cycle.fair1 import _iirf_simple, _iirf_interp
+from ..temperature.millar import calculate_q
+
+
+def _n2o_units(molwt, species):
+    # N2O emissions are expressed in N2 equivalent
+    names = np.char.upper(np.asarray(species, dtype=str))
+    return np.where(names=='N2O', molwt * molwt_builtin.N2/molwt_builtin.N2O,
+      molwt)[()]
 
 
 def _lookup(species):
-    # get list of GHGs from preindconc model
-    named_gases = dir(preindconc)
-
-    # strip out reserved names and the "aslist" list
-    include = [i[:2]!='__' and i!='aslist' for i in named_gases]
-    named_gases = list(compress(named_gases, include))
-
-    # see if the species appears on the list of builtin gases and return
-    # properties if so, otherwise raise error
-    if species in named_gases:
-        inout = {}
-        inout['pi'] = preindconc
-        inout['lt'] = lt_builtin
-        inout['mw'] = molwt_builtin
-        exec("C, L, M = pi."+species+", lt."+species+", mw."+species, inout)
-        return inout['C'], inout['L'], inout['M']
-    else:
-        raise ValueError(species + ' is not in the list of recognised '+
-          'greenhouse gases') 
+    # pre-industrial concentration, lifetime and molecular weight of species
+    rows = registry[lookup(species)]
+    return rows['preindconc'], rows['lifetime'], _n2o_units(rows['molwt'],
+      rows['name'])
 
 
 def emissions(C=None, lifetime=None, molwt=None, species=None):
     """Calculate steady state background emissions from a given lifetime
 
     Keywords:
-        C: concentrations, scalar or None
-            if scalar, steady state concentrations to acheive.
+        C: concentrations, scalar, array or None
+            if given, steady state concentrations to acheive.
             if None, use the pre-industrial concentrations for the specified
               gas.
-        lifetime: scalar or None
-            if scalar, use the given greenhouse gas atmospheric lifetime
+        lifetime: scalar, array or None
+            if given, use the given greenhouse gas atmospheric lifetime
             if None, use the default lifetime for the specified gas
-        molwt: scalar or None
-            if scalar, use molecular weight of given species
+        molwt: scalar, array or None
+            if given, use molecular weight of given species
             if None, use the default molecular weight for the specified gas
-        species: string or None
-            Name of the greenhouse gas concentrations you want to calculate.
-            See ..constants.lifetime module for used names.
+        species: string, list of strings or None
+            Name(s) of the greenhouse gases you want to calculate emissions
+            for. See ..constants.species module for used names.
             If None, use the values given in C, lifetime and wt.
 
     Any user-specified values for C, lifetime and molwt overrides the
-    defaults. They must be specified if species is None.
+    defaults. They must be specified if species is None. For N2O, molwt is
+    converted to N2 equivalent.
 
     Returns:
-        emissions (scalar)
+        emissions (scalar, or array if species is a list)
     """
 
     # if not using a built-in gas, C, lifetime and molwt must be specified.
@@ -62,18 +61,203 @@ def emissions(C=None, lifetime=None, molwt=None, species=None):
               'lifetime and molwt must be specified.')
     else:
         # populate defaults but override if values given
-        species = species.upper()
         C0, lifetime0, molwt0 = _lookup(species)
         if C is None: C=C0
         if lifetime is None: lifetime=lifetime0
-        if molwt is None: molwt=molwt0
-
-        # convert units for N2O
-        if species == 'N2O':
-            molwt = molwt * molwt_builtin.N2/molwt_builtin.N2O
+        if molwt is None:
+            molwt=molwt0
+        else:
+            molwt = _n2o_units(molwt, species)
 
     # now invert the emissions-concentrations relationship
     E = (C * (1.0 - np.exp(-1.0 / lifetime)) * M_ATMOS * molwt /
       molwt_builtin.AIR) * 1e-18
 
     return E
+
+
+def concentrations(E, lifetime=None, molwt=None, species=None):
+    """Calculate steady state concentrations from constant emissions.
+
+    This is the inverse of the emissions() function: the concentration that
+    the one-box model in fair.forward.emis_to_conc settles to under constant
+    emissions E.
+
+    Inputs:
+        E: emissions, scalar
+
+    Keywords:
+        lifetime: scalar, array or None
+            if given, use the given greenhouse gas atmospheric lifetime
+            if None, use the default lifetime for the specified gas
+        molwt: scalar, array or None
+            if given, use molecular weight of given species
+            if None, use the default molecular weight for the specified gas
+        species: string, list of strings or None
+            Name(s) of the greenhouse gases you want to calculate
+            concentrations for. See ..constants.species module for used
+            names. If None, use the values given in lifetime and molwt.
+
+    Returns:
+        concentrations (scalar, or array if species is a list)
+    """
+
+    if species is None:
+        if any((lifetime is None, molwt is None)):
+            raise ValueError('If species is not given then lifetime and '+
+              'molwt must be specified.')
+    else:
+        _, lifetime0, molwt0 = _lookup(species)
+        if lifetime is None: lifetime=lifetime0
+        if molwt is None:
+            molwt=molwt0
+        else:
+            molwt = _n2o_units(molwt, species)
+
+    C = E / ((1.0 - np.exp(-1.0 / lifetime)) * M_ATMOS * molwt /
+      molwt_builtin.AIR * 1e-18)
+
+    return C
+
+
+def spinup(
+    emissions=np.zeros(40),
+    natural=None,
+    useMultigas=True,
+    other_rf=0.0,
+    C_pi=np.array([278., 722., 273., 34.497] + [0.]*25 + [13.0975, 547.996]),
+    lifetimes=False,
+    q        = thermal.q,
+    tcrecs   = thermal.tcrecs,
+    d        = thermal.d,
+    F2x      = thermal.f2x,
+    tcr_dbl  = thermal.tcr_dbl,
+    a        = carbon.a,
+    tau      = carbon.tau,
+    r0       = carbon.r0,
+    rc       = carbon.rc,
+    rt       = carbon.rt,
+    iirf_max = carbon.iirf_max,
+    iirf_h   = carbon.iirf_h,
+    ghg_forcing="Etminan",
+    scale_F2x=True,
+    stwv_from_ch4=None,
+    ):
+    """Calculates the equilibrium state of FaIR under constant emissions.
+
+    Rather than integrating fair_scm for thousands of years of spin-up, the
+    steady state of each box model is solved for directly: the one-box gas
+    cycles are inverted with concentrations(), the carbon boxes and thermal
+    boxes are set to their closed-form fixed points, and the CO2 time constant
+    scale factor is found for the equilibrium temperature.
+
+    CO2 emissions in FaIR are a perturbation to a pre-industrial carbon cycle
+    in balance, and the near-permanent carbon box means that there is no
+    steady state for non-zero CO2 emissions. The CO2 emissions in the
+    emissions input must therefore be zero.
+
+    Keywords:
+        emissions: in multi-gas mode, 40-element array of constant emissions
+            in the same format as a row of the fair_scm emissions input (the
+            first element, the year, is ignored). In CO2-only mode, scalar CO2
+            emissions.
+        natural: 2-element array of natural CH4 and N2O emissions. If None,
+            use the 1765 values that fair_scm uses by default.
+        useMultigas: True for multi-gas mode, False for CO2-only mode.
+        other_rf: non-CO2 radiative forcing in CO2-only mode, W/m2
+        C_pi: pre-industrial (reference) concentrations, used as the baseline
+            for radiative forcing calculations. In CO2-only mode only the
+            first element is used.
+        lifetimes: custom GHG lifetimes (31-element array), or False to use
+            the defaults
+        q, tcrecs, d, F2x, tcr_dbl: thermal response parameters, as in
+            fair_scm
+        a, tau, r0, rc, rt, iirf_max, iirf_h: carbon cycle parameters, as in
+            fair_scm
+        ghg_forcing: 'Etminan' or 'Myhre' relationship for CO2, CH4 and N2O
+        scale_F2x: scale the Etminan CO2 forcing to F2x
+        stwv_from_ch4: stratospheric water vapour to methane forcing ratio.
+            If None, use the fair_scm default for the chosen ghg_forcing.
+
+    Returns:
+        C: equilibrium concentrations (31-element array in multi-gas mode,
+            scalar in CO2-only mode)
+        F: equilibrium radiative forcing relative to C_pi (13-element array
+            in multi-gas mode, scalar in CO2-only mode). Forcing from
+            short-lived species, volcanic and solar is zero, as the emissions
+            are taken to be the pre-industrial reference.
+        T: equilibrium temperature anomaly relative to C_pi, K
+        time_scale_sf: CO2 time constant scale factor at equilibrium
+        restart: state that can be passed to fair_scm as restart_in: the
+            4-tuple of carbon and thermal box state in CO2-only mode, or the
+            9-tuple of a multi-gas restart in multi-gas mode.
+
+    To continue a multi-gas fair_scm run from the equilibrated state, pass
+    restart as restart_in with the same C_pi and natural emissions, and the
+    emissions as E_pi so that short-lived forcing stays at zero.
+    Alternatively, start a run without restart_in from C as C_pi.
+    """
+
+    if useMultigas:
+        emissions = np.asarray(emissions, dtype=float)
+        if emissions.shape != (40,):
+            raise ValueError("In multi-gas mode, emissions should be a "+
+              "40-element array")
+        E_co2 = np.sum(emissions[1:3])
+    else:
+        E_co2 = emissions
+    if np.any(np.asarray(E_co2) != 0):
+        raise ValueError("There is no steady state for non-zero CO2 "+
+          "emissions")
+
+    if useMultigas:
+        if natural is None:
+            natural = natural_builtin.Emissions.emissions[0,:]
+        if type(lifetimes) is not np.ndarray:
+            lifetimes = registry['lifetime'][:nmodel]
+        wt = _lookup(registry['name'][:nmodel])[2]
+
+        # one-box gas cycles; index 0 (CO2) is done in the carbon cycle
+        E_gas = np.concatenate(([0.], emissions[3:5] + natural,
+          emissions[12:]))
+        C = np.zeros(31)
+        C[0] = C_pi[0]
+        C[1:] = concentrations(E_gas[1:], lifetime=lifetimes[1:],
+          molwt=wt[1:])
+
+        if ghg_forcing.lower()=="etminan":
+            from ..forcing.ghg import etminan as ghg
+            if stwv_from_ch4 is None: stwv_from_ch4=0.12
+        elif ghg_forcing.lower()=="myhre":
+            from ..forcing.ghg import myhre as ghg
+            if stwv_from_ch4 is None: stwv_from_ch4=0.15
+        else:
+            raise ValueError(
+              "ghg_forcing should be 'etminan' (default) or 'myhre'")
+
+        F = np.zeros(13)
+        F[0:3] = ghg(C[0:3], C_pi[0:3], F2x=F2x, scale_F2x=scale_F2x)
+        F[3] = np.sum(minor_gases(C[3:], C_pi[3:]))
+        F[5] = ozone_st.magicc(C[15:], C_pi[15:])
+        F[6] = h2o_st.linear(F[1], ratio=stwv_from_ch4)
+    else:
+        C = C_pi if np.isscalar(C_pi) else C_pi[0]
+        F = other_rf
+
+    # Thermal boxes: T_j = q_j * F is the fixed point of the Millar model
+    if type(tcrecs) is np.ndarray:
+        q = calculate_q(tcrecs, d, F2x, tcr_dbl, 1)[0,:]
+    T_j = q * np.sum(F)
+    T = np.sum(T_j)
+
+    # Carbon boxes are empty and no carbon has been taken up at equilibrium
+    R_i = np.zeros(a.shape[0])
+    C_acc = 0.
+    iirf = _iirf_simple(C_acc, T, r0, rc, rt, iirf_max)
+    time_scale_sf = root(_iirf_interp, 0.16,
+      args=(a, tau, iirf_h, iirf))['x'][0]
+
+    restart = (R_i, T_j, C_acc, 0.)
+    if useMultigas:
+        restart = restart + (time_scale_sf, C, emissions, F, 0.)
+    return C, F, T, time_scale_sf, restart
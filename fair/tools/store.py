@@ -0,0 +1,354 @@
+from __future__ import division
+
+import json
+import os
+import tempfile
+
+import numpy as np
+
+"""On-disk store of emissions scenarios and fair_scm results.
+
+A store is a directory holding one JSON index and, for each variable (e.g.
+emissions, C, F, T), a sequence of .npy shards. Every call to append writes
+one shard per variable, and records are numbered consecutively across
+shards. Shards are memory-mapped read-only on first use, so slicing a store
+only reads the parts that are used, and a slice within one shard is a view
+of the file that can be passed straight to fair_scm or tools.runner.
+
+Layout:
+    index.json: years, per-record metadata, and for each variable its dims,
+        dtype, item shape and the record range of each shard
+    <variable>/<shard number>.npy: records of one append
+"""
+
+_index_name = 'index.json'
+
+
+def _json_default(obj):
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError('metadata values should be JSON serialisable, got ' +
+      type(obj).__name__)
+
+
+def _encode_index(index):
+    return json.dumps(index, default=_json_default).encode()
+
+
+def _write_atomic(path, write):
+    """Writes a file through a temporary file in the same directory."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+class StoredArray(object):
+    """Read-only array of one variable of a ScenarioStore.
+
+    Indexing works as for a numpy array whose first axis is the record.
+    An integer or slice of records within one shard returns a view of the
+    memory-mapped shard without copying; other selections are gathered
+    into a new array.
+    """
+
+    def __init__(self, store, name):
+        self.store = store
+        self.name = name
+        info = store._index['variables'][name]
+        self.dims = tuple(info['dims'])
+        self.dtype = np.dtype(info['dtype'])
+        self._item_shape = tuple(info['shape'])
+        self._shards = info['shards']
+        self._starts = np.array([shard[0] for shard in self._shards], dtype=int)
+
+    @property
+    def shape(self):
+        return (len(self),) + self._item_shape
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    def __len__(self):
+        return self._shards[-1][1] if self._shards else 0
+
+    def __array__(self, dtype=None):
+        return np.asarray(self[:], dtype=dtype)
+
+    def _shard(self, k):
+        return self.store._open(self.name, k)
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        first, rest = key[0], key[1:]
+        n = len(self)
+
+        if isinstance(first, (int, np.integer)):
+            i = first + n if first < 0 else first
+            if not 0 <= i < n:
+                raise IndexError('record ' + str(first) + ' out of range ' +
+                  'for ' + self.name + ' with ' + str(n) + ' records')
+            k = np.searchsorted(self._starts, i, side='right') - 1
+            return self._shard(k)[(i - self._starts[k],) + rest]
+
+        if isinstance(first, slice):
+            start, stop, step = first.indices(n)
+            idx = np.arange(start, stop, step)
+            if step > 0 and len(idx) > 0:
+                k = np.searchsorted(self._starts, start, side='right') - 1
+                if idx[-1] < self._shards[k][1]:
+                    s0 = self._starts[k]
+                    return self._shard(k)[(slice(start-s0, stop-s0, step),) +
+                      rest]
+        else:
+            idx = np.asarray(first)
+            if idx.dtype == bool:
+                idx = np.nonzero(idx)[0]
+            idx = np.where(idx < 0, idx + n, idx).astype(int)
+            if np.any((idx < 0) | (idx >= n)):
+                raise IndexError('record index out of range for ' +
+                  self.name + ' with ' + str(n) + ' records')
+
+        if len(idx) == 0:
+            return np.zeros((0,) + self._item_shape, dtype=self.dtype)[
+              (slice(None),) + rest]
+        shard_of = np.searchsorted(self._starts, idx, side='right') - 1
+        out = None
+        for k in np.unique(shard_of):
+            rows = shard_of == k
+            part = self._shard(k)[(idx[rows] - self._starts[k],) + rest]
+            if out is None:
+                out = np.empty((len(idx),) + part.shape[1:], dtype=part.dtype)
+            out[rows] = part
+        return out
+
+
+class ScenarioStore(object):
+    """Directory of emissions scenarios, fair_scm results and metadata.
+
+    Records (e.g. one scenario, or one scenario with an ensemble of
+    parameter sets) are added with append and hold any number of named
+    arrays plus a metadata dict. Arrays are read back with store[name],
+    which indexes like a numpy array without loading the store, or with
+    sel, which selects by metadata, member and year.
+
+    Inputs:
+        path: directory of the store. It is created if it does not exist.
+
+    Keywords:
+        years: (nt,) array of the years of the time axis, used by sel. Only
+            used when a new store is created.
+
+    Example:
+        store = ScenarioStore('scenarios', years=np.arange(1765, 2501))
+        store.append([{'scenario': 'rcp45'}], emissions=E[None])
+        C, F, T = fair_scm(emissions=store['emissions'][0])
+    """
+
+    def __init__(self, path, years=None):
+        self.path = path
+        self._maps = {}
+        if os.path.exists(os.path.join(path, _index_name)):
+            self.refresh()
+        else:
+            os.makedirs(path, exist_ok=True)
+            self._index = {
+                'years': None if years is None else np.asarray(years).tolist(),
+                'meta': [],
+                'variables': {},
+            }
+            self._write_index()
+
+    def refresh(self):
+        """Re-reads the index, e.g. after another process has appended."""
+        with open(os.path.join(self.path, _index_name)) as f:
+            self._index = json.load(f)
+
+    def _write_index(self, text=None):
+        if text is None:
+            text = _encode_index(self._index)
+        _write_atomic(os.path.join(self.path, _index_name),
+          lambda f: f.write(text))
+
+    def _open(self, name, k):
+        if (name, k) not in self._maps:
+            self._maps[name, k] = np.asarray(np.load(os.path.join(self.path,
+              name, '%05d.npy' % k), mmap_mode='r'))
+        return self._maps[name, k]
+
+    def __len__(self):
+        return len(self._index['meta'])
+
+    def __contains__(self, name):
+        return name in self._index['variables']
+
+    def __getitem__(self, name):
+        if name not in self:
+            raise KeyError(name)
+        return StoredArray(self, name)
+
+    @property
+    def variables(self):
+        return list(self._index['variables'])
+
+    @property
+    def meta(self):
+        """List of the metadata dict of each record."""
+        return self._index['meta']
+
+    @property
+    def years(self):
+        years = self._index['years']
+        return None if years is None else np.array(years)
+
+    def append(self, meta=None, dims=None, **arrays):
+        """Adds records to the store.
+
+        Inputs:
+            meta: list of metadata dicts, one per record, e.g. scenario name
+                and parameter values. Values should be JSON serialisable.
+                Default is an empty dict for each record.
+
+        Keywords:
+            dims: dict of variable name to tuple of axis names, used by sel.
+                Only needed when a variable is first added. The default for
+                a variable is ('record', 'year', 'axis2', ...); use e.g.
+                ('record', 'member', 'year') for the T output of an
+                ensemble.
+            name=array: arrays of each variable with the record as the first
+                axis. Every variable in the store should be given, and each
+                array should have the same number of records.
+
+        Returns:
+            range of the new record numbers
+        """
+        dims = {} if dims is None else dims
+        arrays = {name: np.asarray(value) for name, value in arrays.items()}
+        sizes = set(len(value) for value in arrays.values())
+        if len(sizes) != 1:
+            raise ValueError('each array should have the same number of ' +
+              'records; got ' + str(sorted(sizes)))
+        n = sizes.pop()
+        if meta is None:
+            meta = [{} for i in range(n)]
+        if len(meta) != n:
+            raise ValueError('meta should have one dict per record')
+        if len(self) > 0 and set(arrays) != set(self._index['variables']):
+            raise ValueError('arrays should be given for exactly ' +
+              str(sorted(self._index['variables'])))
+
+        # Everything is checked before anything is written, and the index
+        # is only changed once every shard is on disk. Shards written
+        # before a failure are not in the index and are overwritten by the
+        # next append.
+        start = len(self)
+        index = dict(self._index, meta=self._index['meta'] + list(meta),
+          variables=dict(self._index['variables']))
+        for name, value in arrays.items():
+            info = index['variables'].get(name)
+            if info is None:
+                info = {
+                    'dims': list(dims.get(name, ('record', 'year') + tuple(
+                      'axis%d' % i for i in range(2, value.ndim)))),
+                    'dtype': value.dtype.str,
+                    'shape': list(value.shape[1:]),
+                    'shards': [],
+                }
+                if len(info['dims']) != value.ndim:
+                    raise ValueError('dims of ' + name + ' should have ' +
+                      str(value.ndim) + ' names')
+            elif list(value.shape[1:]) != info['shape']:
+                raise ValueError(name + ' records should have shape ' +
+                  str(tuple(info['shape'])) + ', got ' +
+                  str(value.shape[1:]))
+            index['variables'][name] = dict(info,
+              shards=info['shards'] + [[start, start + n]])
+        text = _encode_index(index)
+
+        for name, value in arrays.items():
+            info = index['variables'][name]
+            directory = os.path.join(self.path, name)
+            os.makedirs(directory, exist_ok=True)
+            k = len(info['shards']) - 1
+            data = np.ascontiguousarray(value, dtype=np.dtype(info['dtype']))
+            _write_atomic(os.path.join(directory, '%05d.npy' % k),
+              lambda f: np.save(f, data))
+        self._write_index(text)
+        self._index = index
+        return range(start, start + n)
+
+    def find(self, **query):
+        """Record numbers whose metadata match every keyword, as an array.
+
+        A keyword value may be a single value or a list of allowed values.
+        """
+        out = []
+        for i, meta in enumerate(self.meta):
+            for key, value in query.items():
+                allowed = value if isinstance(value, (list, tuple)) else [value]
+                if key not in meta or meta[key] not in allowed:
+                    break
+            else:
+                out.append(i)
+        return np.array(out, dtype=int)
+
+    def _year_index(self, year):
+        years = self.years
+        if years is None:
+            raise ValueError('store has no years; give years when creating it')
+        if isinstance(year, slice):
+            lo = 0 if year.start is None else np.searchsorted(years, year.start)
+            hi = len(years) if year.stop is None else np.searchsorted(years,
+              year.stop, side='right')
+            return slice(lo, hi)
+        i = np.searchsorted(years, year)
+        if np.any(np.take(years, np.clip(i, 0, len(years)-1)) != year):
+            raise ValueError('year ' + str(year) + ' not in store')
+        return i
+
+    def sel(self, name, records=None, year=None, **axes):
+        """Selects part of a variable by record, year and other axes.
+
+        Inputs:
+            name: variable name
+
+        Keywords:
+            records: record number(s), a slice, or a dict of metadata to
+                match with find. Default is all records.
+            year: a year, a sequence of years, or a slice of years with
+                inclusive start and stop, e.g. slice(2000, 2100)
+            axis=index: index into another named axis, e.g. member=slice(0,
+                100)
+
+        Returns:
+            numpy array, a view of the store where possible
+        """
+        array = self[name]
+        if isinstance(records, dict):
+            records = self.find(**records)
+        key = [slice(None)] * array.ndim
+        key[0] = slice(None) if records is None else records
+        if year is not None:
+            axes['year'] = self._year_index(year)
+        for axis, index in axes.items():
+            if axis not in array.dims:
+                raise ValueError(name + ' has no axis ' + axis + '; axes are ' +
+                  str(array.dims))
+            key[array.dims.index(axis)] = index
+        # select along each axis in turn, so that sequences of indices on
+        # different axes select every combination
+        out = array[key[0]]
+        dropped = np.ndim(key[0]) == 0 and not isinstance(key[0], slice)
+        for axis in range(array.ndim-1, 0, -1):
+            if isinstance(key[axis], slice) and key[axis] == slice(None):
+                continue
+            out = out[(slice(None),) * (axis - dropped) + (key[axis],)]
+        return out
@@ -0,0 +1,306 @@
+from __future__ import division
+
+import numpy as np
+
+"""Streaming ensemble statistics.
+
+Accumulator keeps the running mean, variance and a quantile sketch of each
+output variable at every timestep, without keeping the members themselves.
+Accumulators fed in different processes can be merged.
+"""
+
+
+class _Histogram(object):
+    """Mergeable histogram sketch of many values at each of m points.
+
+    Bins of each point have width 2**e and lie on a grid aligned to zero, so
+    halving the resolution of a point merges pairs of bins exactly. When the
+    values of a point no longer fit in nbins bins its resolution is halved,
+    which keeps the sketch a fixed size and lets any two sketches be merged.
+    A point whose values are all equal so far has no resolution to keep, so
+    its bin width is set again from the range of the values that follow.
+    """
+
+    def __init__(self, m, nbins):
+        self.nbins = nbins
+        self.counts = np.zeros((m, nbins), dtype=np.int64)
+        self.e = np.zeros(m, dtype=int)
+        self.lo = np.zeros(m, dtype=np.int64)
+        self.min = np.full(m, np.inf)
+        self.max = np.full(m, -np.inf)
+
+    def _occupied(self):
+        """First and last occupied bin index of each point."""
+        nonzero = self.counts > 0
+        first = np.argmax(nonzero, axis=1)
+        last = self.nbins - 1 - np.argmax(nonzero[:,::-1], axis=1)
+        occupied = np.any(nonzero, axis=1)
+        return (np.where(occupied, self.lo + first, np.iinfo(np.int64).max),
+          np.where(occupied, self.lo + last, np.iinfo(np.int64).min))
+
+    def _coarsen(self, mask, steps=1):
+        """Halves the resolution of the points in mask, steps times."""
+        rows = np.nonzero(mask)[0]
+        if len(rows) == 0:
+            return
+        steps = np.broadcast_to(steps, mask.shape)[rows]
+        # beyond 63 halvings every bin index is 0 or -1
+        shift = np.minimum(steps, 63)
+        lo = self.lo[rows]
+        new_lo = lo >> shift
+        cols = ((lo[:,None] + np.arange(self.nbins)) >> shift[:,None]) - (
+          new_lo[:,None])
+        flat = (np.arange(len(rows))[:,None] * self.nbins + cols).ravel()
+        self.counts[rows] = np.bincount(flat,
+          weights=self.counts[rows].ravel(),
+          minlength=len(rows)*self.nbins).reshape((len(rows), self.nbins))
+        self.lo[rows] = new_lo
+        self.e[rows] = self.e[rows] + steps
+
+    def _fit(self, lo, hi):
+        """Sets the resolution of each point for values from lo to hi.
+
+        Points holding at most one distinct value take the resolution of
+        the range; others are coarsened if the range does not fit.
+        """
+        scale = np.maximum(hi - lo, np.maximum(np.abs(lo), np.abs(hi)) * 1e-6)
+        with np.errstate(divide='ignore'):
+            e = np.where(scale > 0, np.ceil(np.log2(scale / self.nbins)),
+              0).astype(int)
+        single = ~(self.max > self.min)
+        if np.any(single):
+            value = np.where(np.isfinite(self.min), self.min, 0.)[single]
+            total = np.sum(self.counts[single], axis=1)
+            self.e[single] = e[single]
+            self.lo[single] = np.floor(value / 2.0**e[single]).astype(
+              np.int64)
+            self.counts[single] = 0
+            self.counts[single,0] = total
+        steps = np.where(single, 0, e - self.e)
+        self._coarsen(steps > 0, steps)
+
+    def _add(self, idx, weights):
+        """Adds weighted bin indices at the current resolution.
+
+        idx and weights have shape (k, m). Entries with zero weight are
+        ignored.
+        """
+        idx = idx.copy()
+        present = weights > 0
+        big = np.iinfo(np.int64).max
+        while True:
+            first, last = self._occupied()
+            new_lo = np.minimum(first, np.min(np.where(present, idx, big),
+              axis=0))
+            new_hi = np.maximum(last, np.max(np.where(present, idx, -big),
+              axis=0))
+            too_wide = (new_hi - new_lo >= self.nbins) & (new_hi >= new_lo)
+            if not np.any(too_wide):
+                break
+            self._coarsen(too_wide)
+            idx[:,too_wide] = idx[:,too_wide] // 2
+
+        # move the window of each point to start at its lowest bin
+        new_lo = np.where(new_hi >= new_lo, new_lo, self.lo)
+        shift = self.lo - new_lo
+        if np.any(shift != 0):
+            m = len(self.lo)
+            cols = np.arange(self.nbins)[None,:] + shift[:,None]
+            valid = (cols >= 0) & (cols < self.nbins)
+            rows = np.broadcast_to(np.arange(m)[:,None], cols.shape)
+            counts = np.zeros_like(self.counts)
+            counts[rows[valid], cols[valid]] = self.counts[valid]
+            self.counts = counts
+            self.lo = new_lo
+
+        m = len(self.lo)
+        cols = idx - self.lo
+        flat = (cols * m + np.arange(m))[present]
+        self.counts = self.counts + np.bincount(flat,
+          weights=weights[present], minlength=m*self.nbins).reshape(
+          (self.nbins, m)).T.astype(np.int64)
+
+    def update(self, x):
+        """Adds values x of shape (n, m)."""
+        lo = np.minimum(self.min, np.min(x, axis=0))
+        hi = np.maximum(self.max, np.max(x, axis=0))
+        self._fit(lo, hi)
+        self.min = lo
+        self.max = hi
+        self._add(np.floor(x / 2.0**self.e).astype(np.int64),
+          np.ones(x.shape, dtype=np.int64))
+
+    def merge(self, other):
+        """Adds the values of another sketch of the same points."""
+        if not np.any(other.counts):
+            return
+        other = other.copy()
+        lo = np.minimum(self.min, other.min)
+        hi = np.maximum(self.max, other.max)
+        self._fit(lo, hi)
+        other._fit(lo, hi)
+        e = np.maximum(self.e, other.e)
+        self._coarsen(self.e < e, e - self.e)
+        other._coarsen(other.e < e, e - other.e)
+        self.min = lo
+        self.max = hi
+        idx = (other.lo[:,None] + np.arange(self.nbins)).T
+        self._add(idx, other.counts.T)
+
+    def copy(self):
+        new = _Histogram(len(self.lo), self.nbins)
+        new.counts = self.counts.copy()
+        new.e = self.e.copy()
+        new.lo = self.lo.copy()
+        new.min = self.min.copy()
+        new.max = self.max.copy()
+        return new
+
+    def percentile(self, q):
+        """Percentiles q (array) of each point, shape (len(q), m)."""
+        q = np.atleast_1d(np.asarray(q, dtype=float))
+        cum = np.cumsum(self.counts, axis=1)
+        total = cum[:,-1]
+        out = np.zeros((len(q), len(self.lo)))
+        for i, percent in enumerate(q):
+            target = percent / 100. * total
+            b = np.argmax(cum >= target[:,None], axis=1)
+            before = np.take_along_axis(cum, b[:,None], axis=1)[:,0] - (
+              self.counts[np.arange(len(b)), b])
+            count = self.counts[np.arange(len(b)), b]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                frac = np.where(count > 0, (target - before) / count, 0.)
+            out[i] = (self.lo + b + frac) * 2.0**self.e
+        return np.clip(out, self.min, self.max)
+
+
+class Accumulator(object):
+    """Running ensemble statistics of fair_scm outputs.
+
+    Feed batches of outputs with update(), e.g. the C, F and T arrays
+    returned by tools.runner.run_ensemble, or each batch yielded by
+    tools.runner.run_constrained. For every variable and every timestep (and
+    gas or forcing agent) the accumulator keeps the mean and variance,
+    combined across batches with the parallel algorithm of Chan et al.
+    (1979), and a histogram sketch from which percentiles are estimated.
+    Memory does not depend on the number of members. Accumulators updated
+    in different processes can be combined with merge().
+
+    Keywords:
+        nbins: number of histogram bins per timestep. Bins are at most
+            2/nbins of the range of the ensemble wide, and percentiles are
+            accurate to about one bin width.
+        percentiles: percentiles reported by summary()
+    """
+
+    def __init__(self, nbins=256, percentiles=(5, 16, 50, 84, 95)):
+        self.nbins = nbins
+        self.percentiles = percentiles
+        self.n = {}
+        self._mean = {}
+        self._m2 = {}
+        self._sketch = {}
+        self._shape = {}
+
+    def update(self, **batches):
+        """Adds a batch of ensemble members.
+
+        Keywords:
+            name=array: array of one output variable with the member as the
+                first axis, e.g. update(T=T, C=C) with T of shape
+                (n_members, nt). Batches of a variable must have the same
+                shape apart from the first axis.
+        """
+        for name, x in batches.items():
+            x = np.asarray(x, dtype=float)
+            if name not in self._shape:
+                self._shape[name] = x.shape[1:]
+                m = int(np.prod(x.shape[1:]))
+                self.n[name] = 0
+                self._mean[name] = np.zeros(m)
+                self._m2[name] = np.zeros(m)
+                self._sketch[name] = _Histogram(m, self.nbins)
+            elif x.shape[1:] != self._shape[name]:
+                raise ValueError(name + ' should have shape (n,) + ' +
+                  str(self._shape[name]) + ', got ' + str(x.shape))
+            if len(x) == 0:
+                continue
+            x = x.reshape((len(x), -1))
+            n_b = len(x)
+            mean_b = np.mean(x, axis=0)
+            m2_b = np.sum((x - mean_b)**2, axis=0)
+            self._combine(name, n_b, mean_b, m2_b)
+            self._sketch[name].update(x)
+
+    def _combine(self, name, n_b, mean_b, m2_b):
+        n_a = self.n[name]
+        n = n_a + n_b
+        delta = mean_b - self._mean[name]
+        self._mean[name] = self._mean[name] + delta * n_b / n
+        self._m2[name] = self._m2[name] + m2_b + delta**2 * n_a * n_b / n
+        self.n[name] = n
+
+    def merge(self, other):
+        """Adds the members accumulated by another Accumulator.
+
+        Returns this accumulator.
+        """
+        for name in other._shape:
+            if other.n[name] == 0:
+                continue
+            if name not in self._shape:
+                self._shape[name] = other._shape[name]
+                self.n[name] = 0
+                self._mean[name] = np.zeros_like(other._mean[name])
+                self._m2[name] = np.zeros_like(other._m2[name])
+                self._sketch[name] = _Histogram(len(other._mean[name]),
+                  self.nbins)
+            elif self._shape[name] != other._shape[name]:
+                raise ValueError('shapes of ' + name + ' differ')
+            if other.nbins != self.nbins:
+                raise ValueError('accumulators should have the same nbins')
+            self._combine(name, other.n[name], other._mean[name],
+              other._m2[name])
+            self._sketch[name].merge(other._sketch[name])
+        return self
+
+    def mean(self, name):
+        """Ensemble mean of a variable."""
+        return self._mean[name].reshape(self._shape[name])
+
+    def var(self, name, ddof=1):
+        """Ensemble variance of a variable."""
+        return (self._m2[name] / (self.n[name] - ddof)).reshape(
+          self._shape[name])
+
+    def std(self, name, ddof=1):
+        """Ensemble standard deviation of a variable."""
+        return np.sqrt(self.var(name, ddof=ddof))
+
+    def percentile(self, name, q):
+        """Estimated ensemble percentiles of a variable.
+
+        Inputs:
+            name: variable name
+            q: percentile or sequence of percentiles, 0 to 100
+
+        Returns:
+            array of shape (len(q),) + shape of variable, or the shape of the
+            variable for scalar q
+        """
+        out = self._sketch[name].percentile(q).reshape(
+          (-1,) + self._shape[name])
+        return out[0] if np.isscalar(q) else out
+
+    def summary(self):
+        """Dict of statistics of every variable.
+
+        Each entry is a dict with keys 'n', 'mean', 'std' and 'percentiles',
+        the last of shape (len(self.percentiles),) + shape of variable.
+        """
+        return {name: {
+            'n': self.n[name],
+            'mean': self.mean(name),
+            'std': self.std(name),
+            'percentiles': self.percentile(name, self.percentiles),
+        } for name in self._shape}
@@ -0,0 +1,237 @@
+from __future__ import division
+
+import glob
+import os
+import queue
+import threading
+
+import numpy as np
+try:
+    import pandas as pd
+    has_pandas = True
+except ImportError:
+    has_pandas = False
+
+"""Streaming output of ensemble runs to disk.
+
+EnsembleWriter takes batches of fair_scm outputs as they are produced, e.g.
+from tools.runner.run_batches or each batch yielded by
+tools.runner.run_constrained, and writes them from a background thread so
+that the next batch is computed while the last one is written. The queue of
+batches waiting to be written is bounded, so memory does not grow with the
+size of the ensemble: at most queue_size batches wait in the queue and one
+is being written, in addition to the batch being computed. With the default
+queue_size of 1 that is three batches at peak.
+
+Formats:
+    npy: one .npy shard per variable and batch, in <path>/<variable>/
+        <batch>.npy. Unlike tools.store there is no index file; the member
+        numbers of each batch are stored as the variable 'members'. Shards
+        can be read back memory-mapped.
+    npz: one compressed <path>/<batch>.npz per batch holding every variable
+    parquet: one long-format table per batch in <path>/batch=<batch>/
+        part.parquet, with a row per member and timestep. Needs pandas with a
+        parquet engine (pyarrow or fastparquet).
+"""
+
+formats = ('npy', 'npz', 'parquet')
+
+
+class EnsembleWriter(object):
+    """Writes batches of ensemble outputs in a background thread.
+
+    Use as a context manager, or call close() when done:
+
+        with EnsembleWriter('out', format='npz') as writer:
+            for members, (C, F, T) in run_constrained(...):
+                writer.write(members, C=C, F=F, T=T)
+
+    Arrays passed to write are written as they are, without copying, so
+    they should not be modified afterwards. Errors raised in the background
+    thread are raised again by the next write or by close.
+
+    write blocks while queue_size batches are waiting, so the writer holds at
+    most queue_size + 1 batches (those queued and the one being written) on
+    top of the batch the caller is computing.
+
+    Inputs:
+        path: output directory. It is created if it does not exist.
+
+    Keywords:
+        format: 'npy', 'npz' or 'parquet'
+        member_axis: axis of the arrays along which members vary, e.g. 0 for
+            run_batches and 1 for run_constrained, whose outputs have a
+            leading scenario axis
+        index_names: parquet only; names of the leading axes shared by all
+            arrays, which become index columns. Default is 'member' for the
+            member axis, 'timestep' for the last shared axis and 'axis<i>'
+            for others.
+        queue_size: number of batches that may wait to be written, at
+            least 1
+    """
+
+    def __init__(self, path, format='npy', member_axis=0, index_names=None,
+      queue_size=1):
+        if format not in formats:
+            raise ValueError('format should be one of ' + str(formats))
+        if queue_size < 1:
+            raise ValueError('queue_size should be at least 1, got ' +
+              str(queue_size))
+        if format == 'parquet':
+            if not has_pandas:
+                raise ImportError('format parquet requires pandas')
+            pd.io.parquet.get_engine('auto')
+        self.path = path
+        self.format = format
+        self.member_axis = member_axis
+        self.index_names = index_names
+        self.n_batches = 0
+        self.n_members = 0
+        self._error = None
+        self._closed = False
+        os.makedirs(path, exist_ok=True)
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _check(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def write(self, members=None, **arrays):
+        """Queues a batch for writing.
+
+        Blocks while the queue is full, i.e. while earlier batches are still
+        being written.
+
+        Inputs:
+            members: indices of the members in the batch. Default numbers the
+                members consecutively across batches.
+
+        Keywords:
+            name=array: output variables of the batch, e.g. C=C, F=F, T=T
+        """
+        self._check()
+        if self._closed:
+            raise ValueError('writer is closed')
+        arrays = {name: np.asarray(value) for name, value in arrays.items()}
+        sizes = set(value.shape[self.member_axis] for value in
+          arrays.values())
+        if len(sizes) != 1:
+            raise ValueError('arrays should have the same number of members '+
+              'along axis ' + str(self.member_axis))
+        n = sizes.pop()
+        if members is None:
+            members = np.arange(self.n_members, self.n_members + n)
+        members = np.asarray(members)
+        if len(members) != n:
+            raise ValueError('members should have one index per member')
+        self._queue.put((self.n_batches, members, arrays))
+        self.n_batches += 1
+        self.n_members += n
+
+    def close(self):
+        """Waits for queued batches to be written and stops the thread."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+        self._check()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if self._error is None:
+                try:
+                    getattr(self, '_write_' + self.format)(*item)
+                except BaseException as error:
+                    self._error = error
+
+    def _write_npy(self, k, members, arrays):
+        arrays = dict(arrays, members=members)
+        for name, value in arrays.items():
+            directory = os.path.join(self.path, name)
+            os.makedirs(directory, exist_ok=True)
+            np.save(os.path.join(directory, '%05d.npy' % k), value)
+
+    def _write_npz(self, k, members, arrays):
+        np.savez_compressed(os.path.join(self.path, '%05d.npz' % k),
+          members=members, **arrays)
+
+    def _write_parquet(self, k, members, arrays):
+        shared = min(value.ndim for value in arrays.values())
+        shape = next(iter(arrays.values())).shape[:shared]
+        names = self.index_names
+        if names is None:
+            names = ['axis%d' % i for i in range(shared)]
+            names[-1] = 'timestep'
+            names[self.member_axis] = 'member'
+        index = np.indices(shape).reshape((shared, -1))
+        index[self.member_axis] = members[index[self.member_axis]]
+        columns = dict(zip(names, index))
+        for name, value in arrays.items():
+            if value.shape[:shared] != shape:
+                raise ValueError('arrays should share the leading axes ' +
+                  str(shape) + ', ' + name + ' has shape ' + str(value.shape))
+            value = value.reshape((len(index[0]), -1))
+            if value.shape[1] == 1:
+                columns[name] = value[:,0]
+            else:
+                for j in range(value.shape[1]):
+                    columns[name + '_' + str(j)] = value[:,j]
+        directory = os.path.join(self.path, 'batch=%05d' % k)
+        os.makedirs(directory, exist_ok=True)
+        pd.DataFrame(columns).to_parquet(os.path.join(directory,
+          'part.parquet'), index=False)
+
+
+def read(path, format='npy', member_axis=0, mmap=True):
+    """Reads the output of an EnsembleWriter.
+
+    Inputs:
+        path: output directory of the writer
+
+    Keywords:
+        format: format the writer used
+        member_axis: member axis the writer used; batches are joined along it
+        mmap: npy only; if True, batches are memory-mapped before joining
+
+    Returns:
+        dict of variable name to array of all batches, including 'members',
+        or a pandas.DataFrame for parquet. Raises ValueError if path holds
+        no npy or npz batches.
+    """
+    if format == 'parquet':
+        return pd.read_parquet(path)
+    if format == 'npy':
+        directories = sorted(glob.glob(os.path.join(path, '*', '')))
+        if not directories:
+            raise ValueError('no npy batches in ' + path)
+        out = {}
+        for directory in directories:
+            name = os.path.basename(os.path.dirname(directory))
+            shards = [np.load(f, mmap_mode='r' if mmap else None) for f in
+              sorted(glob.glob(os.path.join(directory, '*.npy')))]
+            out[name] = np.concatenate(shards, axis=0 if name == 'members'
+              else member_axis)
+        return out
+    if format == 'npz':
+        batches = []
+        for f in sorted(glob.glob(os.path.join(path, '*.npz'))):
+            with np.load(f) as batch:
+                batches.append({name: batch[name] for name in batch.files})
+        if not batches:
+            raise ValueError('no npz batches in ' + path)
+        return {name: np.concatenate([batch[name] for batch in batches],
+          axis=0 if name == 'members' else member_axis)
+          for name in batches[0]}
+    raise ValueError('format should be one of ' + str(formats))
@@ -27,7 +27,7 @@ setup(
     license='Apache 2.0',
     packages=find_packages(exclude=['tests*','docs*']),
     package_data={'': ['*.csv']},
-    python_requires='>=3.6, <4',
+    python_requires='>=3.7, <4',
     include_package_data=True,
     install_requires=[
         'matplotlib',
@@ -272,3 +272,119 @@ def test_geoffroy():
     C, F, T, lambda_eff, ohc, heatflux = fair.forward.fair_scm(
         emissions = rcp85.Emissions.emissions,
         temperature_function='Geoffroy')
+
+
+def test_run_ensemble():
+    from fair.tools.runner import run_ensemble
+    n = 6
+    emissions = np.zeros((n, 250))
+    emissions[:,125:] = np.arange(1, n+1)[:,None]
+    tcrecs = np.column_stack((np.linspace(1.2, 2.0, n),
+      np.linspace(2.5, 4.0, n)))
+    for workers in [1, 2]:
+        C, F, T = run_ensemble(emissions, {'tcrecs': tcrecs},
+          workers=workers, chunksize=2, useMultigas=False)
+        assert T.shape == (n, 250)
+        for i in range(n):
+            C1, F1, T1 = fair.forward.fair_scm(emissions=emissions[i],
+              tcrecs=tcrecs[i], useMultigas=False)
+            assert np.array_equal(C[i], C1)
+            assert np.array_equal(T[i], T1)
+    with pytest.raises(ValueError):
+        run_ensemble(emissions, {'tcrecs': tcrecs[:3]}, useMultigas=False)
+
+
+def test_run_batches(tmp_path):
+    from fair.tools.runner import run_ensemble, run_batches
+    from fair.tools.writer import EnsembleWriter, read
+    n = 7
+    tcrecs = np.column_stack((np.linspace(1.2, 2.0, n),
+      np.linspace(2.5, 4.0, n)))
+    emissions = rcp45.Emissions.emissions
+    C, F, T = run_ensemble(emissions, {'tcrecs': tcrecs}, workers=1)
+    for format in ['npy', 'npz']:
+        path = str(tmp_path / format)
+        with EnsembleWriter(path, format=format) as writer:
+            assert run_batches(emissions, writer, {'tcrecs': tcrecs},
+              batch_size=3, workers=1) == n
+        assert writer.n_batches == 3
+        out = read(path, format=format)
+        assert np.array_equal(out['members'], np.arange(n))
+        assert np.array_equal(out['C'], C)
+        assert np.array_equal(out['F'], F)
+        assert np.array_equal(out['T'], T)
+        # nothing written
+        (tmp_path / ('empty_' + format)).mkdir()
+        with pytest.raises(ValueError):
+            read(str(tmp_path / ('empty_' + format)), format=format)
+
+    # errors in the writer thread are raised in the caller
+    writer = EnsembleWriter(str(tmp_path / 'bad'), format='npy')
+    (tmp_path / 'bad' / 'T').write_text('not a directory')
+    writer.write(T=T)
+    with pytest.raises(OSError):
+        writer.close()
+    with pytest.raises(ValueError):
+        EnsembleWriter(str(tmp_path / 'x'), format='csv')
+    # an unbounded queue would not bound memory
+    with pytest.raises(ValueError):
+        EnsembleWriter(str(tmp_path / 'x'), queue_size=0)
+
+
+def test_run_product():
+    from fair.tools.runner import run_product
+    scenarios = np.array([rcp45.Emissions.emissions, rcp85.Emissions.emissions])
+    tcrecs = np.array([[1.4, 2.6], [1.8, 3.2], [2.2, 4.1]])
+    C, F, T = run_product(scenarios, {'tcrecs': tcrecs}, workers=2,
+      scale=np.linspace(0.9, 1.1, 13))
+    assert T.shape == (2, 3, 736)
+    for s in range(2):
+        for p in range(3):
+            C1, F1, T1 = fair.forward.fair_scm(emissions=scenarios[s],
+              tcrecs=tcrecs[p], scale=np.linspace(0.9, 1.1, 13))
+            assert np.allclose(C[s,p], C1)
+            assert np.allclose(F[s,p], F1)
+            assert np.allclose(T[s,p], T1)
+
+    # carbon cycle boxes varying across parameter sets, with other aerosol
+    # and contrail options
+    tau = np.array([[1e6, 394.4, 36.54, 4.304], [1e6, 300., 30., 4.]])
+    options = dict(aerosol_forcing='aerocom+stevens', contrail_forcing='fuel',
+      kerosene_supply=np.linspace(0, 0.3, 736), F_bcsnow=0.01,
+      bcsnow_forcing='external')
+    C, F, T = run_product(scenarios, {'tau': tau}, workers=1, **options)
+    for s in range(2):
+        for p in range(2):
+            C1, F1, T1 = fair.forward.fair_scm(emissions=scenarios[s],
+              tau=tau[p], **options)
+            assert np.allclose(F[s,p], F1)
+            assert np.allclose(T[s,p], T1)
+
+
+def test_run_constrained():
+    from fair.tools.runner import run_constrained
+    scenarios = np.array([rcp45.Emissions.emissions, rcp85.Emissions.emissions])
+    scenarios[1,:250] = scenarios[0,:250]
+    tcrecs = np.array([[1.4, 2.6], [1.8, 3.2], [2.2, 4.1], [1.0, 1.5],
+      [2.0, 3.5]])
+    # accept members that warm by less than 1.2 K by the end of history
+    batches = list(run_constrained(scenarios, 250, lambda T: T[:,-1] < 1.2,
+      params={'tcrecs': tcrecs}, batch_size=2, scaleHistoricalAR5=True))
+    assert len(batches) == 3
+    members = np.concatenate([batch[0] for batch in batches])
+    accepted = 0
+    for p in range(5):
+        C1, F1, T1 = fair.forward.fair_scm(emissions=scenarios[0],
+          tcrecs=tcrecs[p], scaleHistoricalAR5=True)
+        assert (p in members) == (T1[249] < 1.2)
+        accepted += T1[249] < 1.2
+    assert 0 < accepted < 5
+    for batch, (C, F, T) in batches:
+        assert C.shape == (2, len(batch), 736, 31)
+        for j, p in enumerate(batch):
+            for s in range(2):
+                C1, F1, T1 = fair.forward.fair_scm(emissions=scenarios[s],
+                  tcrecs=tcrecs[p], scaleHistoricalAR5=True)
+                assert np.allclose(C[s,j], C1)
+                assert np.allclose(F[s,j], F1)
+                assert np.allclose(T[s,j], T1)
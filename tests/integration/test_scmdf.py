@@ -5,7 +5,10 @@ import numpy.testing as npt
 import pytest
 from scmdata import ScmDataFrame
 
-from fair.tools.scmdf import scmdf_to_emissions, _get_fair_col_unit_context
+from fair.tools.scmdf import (
+    scmdf_to_emissions, scmrun_to_emissions, _get_fair_col_unit_context,
+    ssp245_world_emms_holder, output_to_scmrun, output_to_dataframe
+)
 
 
 scenarios_to_test = ["ssp119", "ssp245", "ssp585"]
@@ -95,3 +98,116 @@ def test_scmdf_to_emissions_all_ssps(scen_model_scmdfs, startyear, endyear):
             assert raw_val.shape != (0, 0)
             assert not np.isnan(res[row_year, idx])
             npt.assert_allclose(res[row_year, idx], raw_val)
+
+
+def test_ssp245_fair_array():
+    res = ssp245_world_emms_holder.fair_array
+    assert res.shape == (751, 40)
+    assert not np.isnan(res).any()
+    assert not res.flags.writeable
+    npt.assert_allclose(res[:, 0], range(1750, 2501))
+
+    for var, idx in (("|N2O", 4), ("|NOx", 8), ("|CFC11", 24)):
+        _, fair_unit, fair_context = _get_fair_col_unit_context(var)
+        raw_val = SSP245_EMMS.filter(
+            variable="*{}".format(var), year=2000, region="World",
+        ).convert_unit(fair_unit, context=fair_context).values.squeeze()
+        npt.assert_allclose(res[250, idx], raw_val)
+
+
+def test_scmrun_to_emissions():
+    all_scenarios = ScmDataFrame(
+        os.path.join(
+            os.path.dirname(__file__), "rcmip_scen_ssp_world_emissions.csv"
+        )
+    )
+    res, index = scmrun_to_emissions(all_scenarios, startyear=1850, endyear=2150)
+    n_scen = all_scenarios[["model", "scenario"]].drop_duplicates().shape[0]
+    assert res.shape == (n_scen, 301, 40)
+    assert len(index) == n_scen
+    assert not np.isnan(res).any()
+
+    for i, row in index.iterrows():
+        for var, idx in (("|CO2|MAGICC AFOLU", 2), ("|N2O", 4), ("|NOx", 8)):
+            _, fair_unit, fair_context = _get_fair_col_unit_context(var)
+            raw_val = all_scenarios.filter(
+                model=row["model"],
+                scenario=row["scenario"],
+                variable="*{}".format(var),
+                year=2050,
+            ).convert_unit(fair_unit, context=fair_context).values.squeeze()
+            npt.assert_allclose(res[i, 2050 - 1850, idx], raw_val)
+
+        # history is SSP245
+        npt.assert_allclose(res[i, :165], res[0, :165])
+
+    # scenarios whose metadata hold NaN keep their own rows
+    partial = all_scenarios.timeseries().reset_index()
+    partial["note"] = np.nan
+    partial.loc[partial["scenario"] == index["scenario"][0], "note"] = "first"
+    partial = ScmDataFrame(partial)
+    res_nan, index_nan = scmrun_to_emissions(partial, startyear=1850, endyear=2150)
+    assert len(index_nan) == n_scen
+    assert index_nan["note"].isnull().sum() == n_scen - 1
+    for i, row in index_nan.iterrows():
+        j = np.nonzero((index["model"] == row["model"]).values & (index["scenario"] == row["scenario"]).values)[0][0]
+        npt.assert_allclose(res_nan[i], res[j])
+
+    with pytest.raises(ValueError):
+        scmrun_to_emissions(all_scenarios, startyear=1700)
+
+
+def test_output_to_scmrun():
+    from fair.forward import fair_scm
+    from fair.RCPs import rcp45
+
+    emissions = rcp45.Emissions.emissions
+    years = rcp45.Emissions.year
+    runs = [fair_scm(emissions=emissions, tcrecs=np.array(tcrecs))
+            for tcrecs in ([1.5, 3.0], [2.0, 4.0])]
+    C, F, T = (np.array(out) for out in zip(*runs))
+
+    res = output_to_scmrun(years, C, F, T, meta={"scenario": "rcp45", "tcr": [1.5, 2.0]})
+    assert res.timeseries().shape == (2 * (31 + 13 + 1), 736)
+    npt.assert_allclose(
+        res.filter(variable="Surface Air Temperature Change", tcr=2.0).values.squeeze(), T[1]
+    )
+    ch4 = res.filter(variable="Atmospheric Concentrations|CH4", ensemble_member=0)
+    assert ch4.get_unique_meta("unit", no_duplicates=True) == "ppb"
+    npt.assert_allclose(ch4.values.squeeze(), C[0, :, 1])
+    npt.assert_allclose(
+        res.filter(variable="*|Natural|Volcanic", ensemble_member=1).values.squeeze(),
+        F[1, :, 11],
+    )
+
+    _, F_ar6, _ = fair_scm(emissions=emissions, efficacy=np.ones(41), diagnostics="AR6")
+    df = output_to_dataframe(years, F=F_ar6[None])
+    assert df.shape[0] == 41 * 736
+    assert df["variable"].nunique() == 41
+    with pytest.raises(ValueError):
+        output_to_dataframe(years, F=F_ar6[None, :, :40])
+
+
+def test_unit_factors(monkeypatch):
+    from fair.tools import scmdf
+
+    # every table entry agrees with pint
+    for (fair_col, in_unit), factor in scmdf.UNIT_FACTORS.items():
+        _, fair_unit, context = _get_fair_col_unit_context(
+            scmdf.EMISSIONS_SPECIES_UNITS_CONTEXT["species"][fair_col - 1]
+        )
+        npt.assert_allclose(
+            factor, scmdf._pint_unit_factor(in_unit, fair_unit, context), rtol=1e-12
+        )
+
+    # units not in the table fall back to pint
+    assert (3, "TgCH4/yr") not in scmdf.UNIT_FACTORS
+    npt.assert_allclose(scmdf._unit_factor("Tg CH4/yr", 3, "MtCH4 / yr", None), 1)
+
+    # RCMIP scenarios convert without pint
+    def no_pint(*args):
+        raise AssertionError("pint should not be needed")
+
+    monkeypatch.setattr(scmdf, "_pint_unit_factor", no_pint)
+    res, _ = scmrun_to_emissions(SCENARIOS, startyear=1850, endyear=2100)
+    assert not np.isnan(res).any()
@@ -5,9 +5,12 @@ from fair.RCPs import rcp3pd, rcp45, rcp6, rcp85, rcp26, rcp60
 #from fair.SSPs import historical, ssp119, ssp126, ssp245, ssp370, ssp434, ssp460, ssp534over, ssp585
 import numpy as np
 import os
+from scipy import stats
 from fair.constants import molwt, radeff, lifetime
-from fair.tools.constrain import hist_temp
+from fair.tools.constrain import hist_temp, HistTemp
 from fair.tools.gwp import gwp
+from fair.tools.impulse import impulse_response
+from fair.tools import metrics
 
 
 def test_ten_GtC_pulse():
@@ -225,6 +228,43 @@ def test_restart_co2_continuous():
     assert np.all(T == np.concatenate((T1, T2)))
 
 
+def test_restart_multigas_continuous():
+    """Tests that a multi-gas run with a restart produces the same results as
+    a multi-gas run without a restart."""
+
+    from fair.ancil import natural, cmip6_volcanic, cmip6_solar
+    E = rcp45.Emissions.emissions
+    series = {'natural': natural.Emissions.emissions,
+              'F_volcanic': cmip6_volcanic.Forcing.volcanic,
+              'F_solar': cmip6_solar.Forcing.solar}
+    # both temperature-dependent tropospheric ozone options
+    for tropO3_forcing in ('stevenson', 'cmip6'):
+        C, F, T = fair.forward.fair_scm(emissions=E,
+            tropO3_forcing=tropO3_forcing)
+
+        C1, F1, T1, restart = fair.forward.fair_scm(
+            emissions      = E[:250],
+            restart_out    = True,
+            tropO3_forcing = tropO3_forcing,
+            **{key: value[:250] for key, value in series.items()}
+            )
+
+        C2, F2, T2 = fair.forward.fair_scm(
+            emissions      = E[250:],
+            restart_in     = restart,
+            tropO3_forcing = tropO3_forcing,
+            **{key: value[250:] for key, value in series.items()}
+            )
+
+        assert np.all(C == np.concatenate((C1, C2)))
+        assert np.all(F == np.concatenate((F1, F2)))
+        assert np.all(T == np.concatenate((T1, T2)))
+
+    with pytest.raises(ValueError):
+        fair.forward.fair_scm(emissions=E[250:], restart_in=restart[:4],
+          **{key: value[250:] for key, value in series.items()})
+
+
 def test_inverse_restart():
     """Tests restarts for inverse FaIR."""
 
@@ -265,6 +305,91 @@ def test_constrain():
     assert accept3==False
 
 
+def test_constrain_ensemble():
+    """Checks the vectorised constraint against linregress per member"""
+
+    datadir = os.path.join(os.path.dirname(__file__),
+        '../../fair/tools/tempobs/')
+    tempobsdata = np.loadtxt(datadir+'had4_krig_annual_v2_0_0.csv')
+    years   = tempobsdata[:,0]
+    tempobs = tempobsdata[:,1]
+
+    constraint = HistTemp(tempobs, years)
+    _,_,_,so,io = hist_temp(tempobs, tempobs, years)
+    assert constraint.slope_o==so
+    assert constraint.intercept_o==io
+
+    # members with trends either side of the accepted range
+    trends = np.linspace(-2, 2, 41) * constraint.CI_o + constraint.slope_o
+    Tmodel = (trends[:,None] * (years - years[0]) +
+      np.sin(years)[None,:] * 0.1)
+    accept, sm, im = constraint.accept(Tmodel)
+    assert accept.shape == (41,)
+    for i in range(41):
+        slope, intercept = stats.linregress(years, Tmodel[i])[:2]
+        assert np.allclose(sm[i], slope, rtol=1e-10, atol=0)
+        assert np.allclose(im[i], intercept, rtol=1e-8, atol=0)
+        assert accept[i] == hist_temp(tempobs, Tmodel[i], years)[0]
+    assert 0 < np.sum(accept) < 41
+
+
+def test_likelihood():
+    """Checks the importance weighting of an ensemble"""
+
+    from fair.tools.constrain import Likelihood, hadcrut4, anomaly
+    tcrecs = np.array([[1.0, 1.5], [1.4, 2.5], [1.8, 3.2], [2.5, 4.5],
+      [3.0, 6.0]])
+    years = rcp45.Emissions.year
+    T = np.zeros((5, 736))
+    C = np.zeros((5, 736, 31))
+    F = np.zeros((5, 736, 13))
+    for i in range(5):
+        C[i], F[i], T[i] = fair.forward.fair_scm(
+          emissions=rcp45.Emissions.emissions, tcrecs=tcrecs[i])
+
+    obs_years, Tobs = hadcrut4()
+    assert obs_years[0] == 1850
+    lik = Likelihood(5)
+    ll_warming = lik.observe_warming(T, years)
+    constraint = HistTemp(Tobs, obs_years)
+    accept = constraint.accept(T[:,85:252])[0]
+    # accepted members are more likely than rejected ones
+    assert np.min(ll_warming[accept]) > np.max(ll_warming[~accept])
+    # explicit observations give the same result
+    lik.remove('warming')
+    assert np.allclose(lik.observe_warming(T, years, Tobs=Tobs,
+      obs_years=obs_years), ll_warming)
+    with pytest.raises(ValueError):
+        lik.observe_warming(T, years, Tobs=Tobs)
+    with pytest.raises(ValueError):
+        lik.observe_warming(T, years, obs_years=obs_years)
+
+    co2 = C[:,years==2016,0][:,0]
+    lik.observe('co2', co2, 404., 2.)
+    lik.observe_range('erf_aerosol', anomaly(F[:,:,8], years, (2011, 2011)),
+      -1.9, -0.1)
+    w = lik.weights()
+    assert np.isclose(np.sum(w), 1)
+    assert 1 <= lik.ess() <= 5
+
+    # changing one observation matches recalculating from scratch
+    lik.update('co2', obs=400.)
+    fresh = Likelihood(5)
+    fresh.observe_warming(T, years)
+    fresh.observe('co2', co2, 400., 2.)
+    fresh.observe_range('erf_aerosol',
+      anomaly(F[:,:,8], years, (2011, 2011)), -1.9, -0.1)
+    assert np.allclose(lik.log_weights(), fresh.log_weights())
+    assert np.allclose(lik.weights(['co2']), fresh.weights(['co2']))
+
+    # uniform weights give back every member
+    lik.remove('co2')
+    lik.remove('warming')
+    lik.remove('erf_aerosol')
+    assert np.isclose(lik.ess(), 5)
+    assert np.all(lik.resample(seed=1) == np.arange(5))
+
+
 def test_gwp():
     """Checks that GWP calculator produces correct GWPs."""
 
@@ -286,6 +411,60 @@ def test_gwp():
         gwp(100, lifetime.CFC11, radeff.CFC11, molwt.CFC11), decimals=-1)==4660
 
 
+def test_metrics_table():
+    """Checks vectorised metrics agree with the single-gas GWP calculator."""
+    horizons = np.array([20, 100])
+    table = metrics.table(horizons)
+    for name in ['CH4', 'N2O', 'CFC11', 'SF6', 'HFC134A']:
+        tau = 12.4 if name=='CH4' else getattr(lifetime, name)
+        f = {'CH4': 0.65, 'N2O': -0.071874}.get(name, 0.)
+        for i, H in enumerate(horizons):
+            assert np.isclose(table['gwp'][metrics.index(name), i],
+              gwp(H, tau, getattr(radeff, name), getattr(molwt, name), f=f))
+    assert np.all(table['gwp'][metrics.index('CO2')] == 1)
+    assert np.all(table['gtp'][metrics.index('CO2')] == 1)
+    assert metrics.table(horizons) is table
+
+    names = np.array(['CH4', 'ch4', 'CCl4', 'CO2'])
+    co2e = metrics.co2_equivalent(np.ones(4), names)
+    assert co2e[0] == co2e[1] == table['gwp'][metrics.index('CH4'), 1]
+    assert co2e[2] == table['gwp'][metrics.index('CARB_TET'), 1]
+    assert co2e[3] == 1
+    with pytest.raises(ValueError):
+        metrics.co2_equivalent(1., 'XYZ')
+
+    # a lifetime equal to a thermal response timescale is the limit of
+    # nearby lifetimes
+    d = fair.defaults.thermal.d
+    agtp = metrics.agtp(50., d[1] * np.array([1., 1.001, 0.999]),
+      radeff.CH4, molwt.CH4)
+    assert np.all(np.isfinite(agtp))
+    assert np.allclose(agtp[0], agtp[1:], rtol=1e-3)
+
+
+def test_impulse_response():
+    """Checks model-derived metrics from pulse runs are sensible."""
+    metrics = impulse_response(rcp45.Emissions.emissions, species=[1,3],
+      pulse_years=[2000, 2010], pulse_sizes=[1., 10.], horizon=100)
+    assert metrics['gwp'].shape == (2, 2, 2, 100)
+    assert np.allclose(metrics['gwp'][0,:,0], 1)
+    assert np.allclose(metrics['gtp'][0,:,0], 1)
+    # larger pulses differ only through carbon cycle nonlinearity
+    assert np.allclose(metrics['gwp'][0,:,1], 1, rtol=0.01)
+    # full model methane GWP100 includes ozone and stratospheric water vapour
+    assert 20 < metrics['gwp'][1,0,0,99] < 40
+    assert metrics['gtp'][1,0,0,99] < metrics['gwp'][1,0,0,99]
+    # AR5 AGWP100 for CO2 is 9.17e-14 W m-2 yr kg-1
+    assert np.isclose(metrics['agwp'][0,0,0,99], 9.17e-14, rtol=0.2)
+    # batched runs match a separate pair of baseline and pulse runs
+    E = rcp45.Emissions.emissions.copy()
+    _, _, T_base = fair.forward.fair_scm(emissions=E)
+    E[245,3] = E[245,3] + 10.
+    _, _, T_pulse = fair.forward.fair_scm(emissions=E)
+    assert np.allclose(metrics['agtp'][1,1,1],
+      (T_pulse - T_base)[246:346] / 1e10)
+
+
 def test_gwp_newghgs():
     """Test CMIP6 GHGs recreate AR5 GWPs.
 
@@ -377,3 +556,64 @@ def test_ariaci_stevens():
     )
     assert np.allclose(F[:,8], np.sum(ariaci,axis=1))
 
+
+
+def test_multiyear_timestep():
+    """Checks multi-year timesteps against the annual reproduction runs.
+
+    Tolerances are just above the errors documented for the timestep
+    keyword of fair_scm.
+    """
+    # the ten GtC pulse experiment, against its annual reference data
+    datadir = os.path.join(os.path.dirname(__file__), 'ten_GtC_pulse/')
+    C_expected = np.load(datadir + 'C.npy')
+    T_expected = np.load(datadir + 'T.npy')
+    emissions = np.zeros(250)
+    emissions[125:] = 10.0
+    other_rf = 0.5*np.sin(2*np.pi*np.arange(250)/14.0)
+    for timestep, rtol, atol in ((2, 0.008, 0.02), (5, 0.02, 0.07)):
+        C,F,T = fair.forward.fair_scm(
+            emissions=emissions[::timestep], other_rf=other_rf[::timestep],
+            useMultigas=False, r0=32.4, tcr_dbl=70, timestep=timestep)
+        assert np.allclose(C, C_expected[::timestep], rtol=rtol, atol=0)
+        assert np.allclose(T, T_expected[::timestep], rtol=0, atol=atol)
+
+    # multi-year timesteps should track the annual model on their own years
+    emissions = rcp45.Emissions.emissions
+    natural = fair.ancil.natural.Emissions.emissions
+    C1,F1,T1 = fair.forward.fair_scm(
+        emissions=emissions,
+        F_volcanic=0.,
+        F_solar=0.
+    )
+    C5,F5,T5 = fair.forward.fair_scm(
+        emissions=emissions[::5],
+        natural=natural[::5],
+        F_volcanic=0.,
+        F_solar=0.,
+        timestep=5
+    )
+    assert np.allclose(T5, T1[::5], atol=0.03)
+    assert np.allclose(C5[:,:3], C1[::5,:3], rtol=0.02)
+    C2,F2,T2 = fair.forward.fair_scm(
+        emissions=emissions[::2],
+        natural=natural[::2],
+        F_volcanic=0.,
+        F_solar=0.,
+        timestep=2
+    )
+    assert np.allclose(T2, T1[::2], atol=0.01)
+    assert np.allclose(C2[:,:3], C1[::2,:3], rtol=0.005)
+
+    emissions = np.zeros(500)
+    emissions[:200] = 10.0 * np.sin(np.pi * np.arange(200) / 200.)
+    C1,F1,T1 = fair.forward.fair_scm(emissions=emissions, useMultigas=False)
+    C5,F5,T5 = fair.forward.fair_scm(emissions=emissions[::5],
+        useMultigas=False, timestep=5)
+    assert np.allclose(C5, C1[::5], rtol=0.01)
+    assert np.allclose(T5, T1[::5], atol=0.03)
+
+
+def test_timestep_valueerror():
+    with pytest.raises(ValueError):
+        fair.forward.fair_scm(emissions=rcp45.Emissions.emissions, timestep=0)